@@ -0,0 +1,419 @@
+# ============================================
+# ODOO ORM BENCHMARKS - GUIDE SCENARIOS
+# ============================================
+# Runs the operations of Search.py, Write.py and Create.py against a local
+# database filled with seeded synthetic data, and compares every run with a
+# saved baseline.
+#
+# Usage (database with the `sale` module installed):
+#   python Benchmark.py -d bench --generate                  # fill once
+#   python Benchmark.py -d bench --save-baseline             # on main
+#   python Benchmark.py -d bench                             # on your branch
+#   python Benchmark.py -d bench --only search_ --repeat 10
+#
+# Each scenario records: wall time, SQL count, rows fetched, peak memory.
+# Exit code is 1 when a metric regresses beyond its threshold.
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+
+import odoo
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+# Allowed increase before a metric counts as a regression
+THRESHOLDS = {
+    'time': 0.10,       # 10% slower (noise)
+    'queries': 0.0,     # any extra query
+    'rows': 0.0,        # any extra row fetched
+    'memory': 0.20,     # 20% more peak memory
+}
+# Below these absolute differences nothing is reported (timer/allocator noise)
+MIN_DELTA = {'time': 0.002, 'queries': 0, 'rows': 0, 'memory': 64 * 1024}
+
+
+# ============================================
+# 1. SYNTHETIC DATA GENERATOR
+# ============================================
+# Rows are copied from a template record created through the ORM, so every
+# NOT NULL column gets a valid value; only the columns the scenarios use
+# are randomized. Everything runs in SQL with setseed(): same seed, same data.
+
+def _clone_rows(env, table, template_id, count, overrides, params):
+    """ Insert ``count`` copies of row ``template_id`` of ``table``, with the
+    SQL expressions ``overrides`` (which can use the series number ``g``).
+    Return the (first, last) id inserted: the ids are set explicitly, so
+    they are contiguous even if the id sequence has gaps.
+    """
+    env.cr.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s AND column_name != 'id'
+        ORDER BY ordinal_position
+    """, [table])
+    columns = [name for name, in env.cr.fetchall()]
+    select = [overrides.get(name, 't."%s"' % name) for name in columns]
+    # Lock the table: nobody else may take ids above MAX(id) meanwhile
+    env.cr.execute('LOCK TABLE "%s" IN SHARE ROW EXCLUSIVE MODE' % table)
+    env.cr.execute('SELECT COALESCE(MAX(id), 0) FROM "%s"' % table)
+    first = env.cr.fetchone()[0] + 1
+    chunk = 500000
+    for start in range(0, count, chunk):
+        env.cr.execute("""
+            INSERT INTO "{table}" (id, {columns})
+            SELECT %(first)s - 1 + g, {select} FROM "{table}" t, generate_series(%(start)s, %(stop)s) g
+            WHERE t.id = %(template)s
+            ORDER BY g
+        """.format(
+            table=table,
+            columns=", ".join('"%s"' % name for name in columns),
+            select=", ".join(select),
+        ), dict(params, first=first, start=start + 1, stop=min(start + chunk, count), template=template_id))
+        _logger.info("%s: %d/%d rows", table, min(start + chunk, count), count)
+    # The next ORM create() must not reuse these ids
+    env.cr.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [table, first + count - 1])
+    return first, first + count - 1
+
+
+def generate_data(env, partners=1000000, orders=500000, lines=5000000, seed=42):
+    """ Fill the database with ``partners`` partners (20% companies, 30% of
+    the others with a parent), ``orders`` sale orders and ``lines`` lines.
+    """
+    env.cr.execute("SELECT setseed(%s)", [(seed % 1000) / 1000.0])
+    product = env['product.product'].search([('sale_ok', '=', True)], limit=1) or env['product.product'].create({
+        'name': 'Benchmark Product', 'list_price': 100.0,
+    })
+    template_partner = env['res.partner'].create({'name': 'Benchmark Template', 'email': 'template@example.com'})
+    template_order = env['sale.order'].create({
+        'partner_id': template_partner.id,
+        'order_line': [(0, 0, {'product_id': product.id, 'product_uom_qty': 1, 'price_unit': 1.0})],
+    })
+    env.flush_all()
+    params = {
+        'countries': env['res.country'].search([]).ids,
+        'products': env['product.product'].search([('sale_ok', '=', True)]).ids,
+    }
+
+    # --- Partners ---
+    partner_ids = _clone_rows(env, 'res_partner', template_partner.id, partners, {
+        'name': "'Partner ' || g",
+        'complete_name': "'Partner ' || g",
+        'email': "'partner' || g || '@example.com'",
+        'is_company': "g %% 5 = 0",
+        'country_id': "(%(countries)s::int[])[1 + floor(random() * array_length(%(countries)s::int[], 1))::int]",
+        'parent_id': "NULL",
+        'parent_path': "NULL",
+        'active': "random() > 0.05",
+    }, params)
+    # Children are attached to a random company among the generated ones:
+    # companies are the rows g = 5k, i.e. the ids first - 1 + 5k
+    env.cr.execute("""
+        UPDATE res_partner SET parent_id = CASE
+            WHEN NOT is_company AND random() < 0.3
+            THEN %(first)s - 1 + 5 * (1 + floor(random() * (%(count)s / 5))::int)
+        END
+        WHERE id BETWEEN %(first)s AND %(last)s
+    """, {'first': partner_ids[0], 'last': partner_ids[1], 'count': partners})
+    env.cr.execute("""
+        UPDATE res_partner SET
+            parent_path = COALESCE(parent_id || '/', '') || id || '/',
+            commercial_partner_id = COALESCE(parent_id, id)
+        WHERE id BETWEEN %(first)s AND %(last)s;
+    """, {'first': partner_ids[0], 'last': partner_ids[1]})
+
+    # --- Orders ---
+    order_ids = _clone_rows(env, 'sale_order', template_order.id, orders, {
+        'name': "'BENCH/' || lpad(g::text, 7, '0')",
+        'partner_id': "%(partner_first)s + floor(random() * %(partners)s)::int",
+        'date_order': "now() at time zone 'UTC' - random() * interval '730 days'",
+        'state': "(ARRAY['draft', 'sent', 'sale', 'cancel'])[1 + floor(random() * 4)::int]",
+    }, dict(params, partner_first=partner_ids[0], partners=partners))
+    env.cr.execute("""
+        UPDATE sale_order SET partner_invoice_id = partner_id, partner_shipping_id = partner_id
+        WHERE id BETWEEN %s AND %s
+    """, order_ids)
+
+    # --- Lines (spread evenly over the orders) ---
+    qty, price, discount = "(1 + g %% 10)", "round((random() * 1000)::numeric, 2)", "(CASE WHEN g %% 5 = 0 THEN 10 ELSE 0 END)"
+    line_ids = _clone_rows(env, 'sale_order_line', template_order.order_line.id, lines, {
+        'order_id': "%(order_first)s + g %% %(orders)s",
+        'product_id': "(%(products)s::int[])[1 + g %% array_length(%(products)s::int[], 1)]",
+        'product_uom_qty': qty,
+        'price_unit': price,
+        'discount': discount,
+    }, dict(params, order_first=order_ids[0], orders=orders))
+    env.cr.execute("""
+        UPDATE sale_order_line SET
+            price_subtotal = round(product_uom_qty * price_unit * (1 - discount / 100), 2),
+            price_total = round(product_uom_qty * price_unit * (1 - discount / 100), 2)
+        WHERE id BETWEEN %s AND %s
+    """, line_ids)
+    env.cr.execute("""
+        UPDATE sale_order o SET amount_untaxed = l.total, amount_total = l.total, amount_tax = 0
+        FROM (
+            SELECT order_id, SUM(price_subtotal) AS total FROM sale_order_line
+            WHERE id BETWEEN %s AND %s GROUP BY order_id
+        ) l
+        WHERE o.id = l.order_id
+    """, line_ids)
+
+    env.cr.execute("ANALYZE res_partner; ANALYZE sale_order; ANALYZE sale_order_line")
+    env['ir.config_parameter'].sudo().set_param('benchmark.data', json.dumps({
+        'seed': seed, 'partners': partner_ids, 'orders': order_ids, 'lines': line_ids,
+    }))
+    env.invalidate_all()
+
+
+# ============================================
+# 2. SCENARIOS (one per guide operation)
+# ============================================
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+# --- Search.py ---
+@scenario
+def search_basic(env, data):
+    env['sale.order'].search([('state', 'in', ['draft', 'sent'])])
+
+
+@scenario
+def search_last_record(env, data):
+    env['sale.order'].search([], order='id DESC', limit=1)
+
+
+@scenario
+def search_ilike(env, data):
+    env['res.partner'].search([('name', 'ilike', '%4242%')])
+
+
+@scenario
+def search_or(env, data):
+    env['res.partner'].search(['|', ('is_company', '=', True), ('email', '=ilike', 'partner12%')], limit=1000)
+
+
+@scenario
+def search_relational_path(env, data):
+    env['sale.order'].search([('partner_id.country_id.code', '=', 'US')], limit=1000)
+
+
+@scenario
+def search_child_of(env, data):
+    env.cr.execute("""
+        SELECT parent_id FROM res_partner WHERE parent_id BETWEEN %s AND %s
+        GROUP BY parent_id ORDER BY COUNT(*) DESC, parent_id LIMIT 1
+    """, data['partners'])
+    env['res.partner'].search([('id', 'child_of', env.cr.fetchone()[0])])
+
+
+@scenario
+def search_count(env, data):
+    env['sale.order'].search_count([('state', '=', 'sale')])
+
+
+@scenario
+def search_read(env, data):
+    env['res.partner'].search_read([('is_company', '=', True)], ['name', 'email', 'country_id'], limit=10000)
+
+
+@scenario
+def search_date_range(env, data):
+    first_day = odoo.fields.Date.today().replace(day=1)
+    env['sale.order'].search([('state', '=', 'sale'), ('date_order', '>=', first_day)])
+
+
+# --- Write.py ---
+@scenario
+def write_batch(env, data):
+    partners = env['res.partner'].browse(range(data['partners'][0], data['partners'][0] + 10000))
+    partners.write({'active': True})
+
+
+@scenario
+def write_loop(env, data):
+    lines = env['sale.order.line'].browse(range(data['lines'][0], data['lines'][0] + 1000))
+    for line in lines:
+        line.price_unit = line.price_unit * 1.1
+
+
+@scenario
+def write_one2many_commands(env, data):
+    orders = env['sale.order'].browse(range(data['orders'][0], data['orders'][0] + 100))
+    product_id = orders.order_line[:1].product_id.id
+    for order in orders:
+        first, second = order.order_line[:2]
+        order.write({'order_line': [
+            (0, 0, {'product_id': product_id, 'product_uom_qty': 1, 'price_unit': 10.0}),
+            (1, first.id, {'product_uom_qty': 3}),
+            (2, second.id, 0),
+        ]})
+
+
+@scenario
+def write_many2many(env, data):
+    tags = env['res.partner.category'].search([], limit=3) or env['res.partner.category'].create([
+        {'name': 'Benchmark %s' % index} for index in range(3)
+    ])
+    partners = env['res.partner'].browse(range(data['partners'][0], data['partners'][0] + 5000))
+    partners.write({'category_id': [(6, 0, tags.ids)]})
+
+
+# --- Create.py ---
+@scenario
+def create_nested(env, data):
+    product_ids = env['sale.order.line'].browse(data['lines'][0]).order_id.order_line.product_id.ids
+    env['sale.order'].create([{
+        'partner_id': data['partners'][0] + index,
+        'date_order': '2025-11-07',
+        'note': 'Rush delivery needed',
+        'order_line': [
+            (0, 0, {'product_id': product_id, 'product_uom_qty': 2, 'price_unit': 1000.0, 'discount': 5.0})
+            for product_id in product_ids[:3]
+        ],
+    } for index in range(100)])
+
+
+# ============================================
+# 3. MEASURE
+# ============================================
+def measure(env, func, data, trace_memory=False):
+    """ Run ``func`` once inside a savepoint that is rolled back afterwards,
+    so every run sees the same data. Return its metrics. Tracing memory
+    slows Python down, so it is done in a separate run from the timings.
+    """
+    cr = env.cr
+    counter = {'queries': 0, 'rows': 0}
+    execute = cr.execute
+
+    def counting_execute(query, params=None, log_exceptions=True):
+        result = execute(query, params, log_exceptions)
+        counter['queries'] += 1
+        if cr.description is not None:
+            counter['rows'] += max(cr.rowcount, 0)
+        return result
+
+    env.invalidate_all()
+    cr.execute("SAVEPOINT benchmark")
+    if trace_memory:
+        tracemalloc.start()
+    cr.execute = counting_execute
+    try:
+        start = time.perf_counter()
+        func(env, data)
+        env.flush_all()
+        elapsed = time.perf_counter() - start
+    finally:
+        del cr.execute
+        peak = None
+        if trace_memory:
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        env.invalidate_all(flush=False)
+        cr.execute("ROLLBACK TO SAVEPOINT benchmark")
+    return {'time': elapsed, 'queries': counter['queries'], 'rows': counter['rows'], 'memory': peak}
+
+
+def run(env, names, repeat=5):
+    data = json.loads(env['ir.config_parameter'].sudo().get_param('benchmark.data') or 'null')
+    if not data:
+        raise SystemExit("No benchmark data in this database, run with --generate first.")
+    results = {}
+    for name in names:
+        # The first run warms up the caches, it is not recorded
+        measure(env, SCENARIOS[name], data)
+        runs = [measure(env, SCENARIOS[name], data) for _ in range(repeat)]
+        traced = measure(env, SCENARIOS[name], data, trace_memory=True)
+        results[name] = {
+            'time': statistics.median(run['time'] for run in runs),
+            'queries': max(run['queries'] for run in runs),
+            'rows': max(run['rows'] for run in runs),
+            'memory': traced['memory'],
+        }
+        _logger.info("%s: %s", name, results[name])
+    return results
+
+
+def compare(results, baseline):
+    """ Return the list of ``(scenario, metric, baseline, current)`` regressions. """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(name, {}).get(metric)
+            if reference is None:
+                continue
+            if value - reference > max(reference * THRESHOLDS[metric], MIN_DELTA[metric]):
+                regressions.append((name, metric, reference, value))
+    return regressions
+
+
+def report(results, baseline):
+    print("%-28s %10s %8s %10s %10s" % ('scenario', 'time (ms)', 'queries', 'rows', 'peak (KB)'))
+    for name, metrics in results.items():
+        before = baseline.get(name, {})
+
+        def cell(metric, scale=1):
+            value = "%d" % round(metrics[metric] * scale)
+            if metric in before and before[metric]:
+                value += " (%+d%%)" % round(100 * (metrics[metric] - before[metric]) / before[metric])
+            return value
+
+        print("%-28s %10s %8s %10s %10s" % (
+            name, cell('time', 1000), cell('queries'), cell('rows'), cell('memory', 1 / 1024),
+        ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ORM operations of the guides.")
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument('-c', '--config', help="Odoo configuration file")
+    parser.add_argument('--generate', action='store_true', help="fill the database with synthetic data")
+    parser.add_argument('--partners', type=int, default=1000000)
+    parser.add_argument('--orders', type=int, default=500000)
+    parser.add_argument('--lines', type=int, default=5000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help="run the scenarios whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default='bench_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    odoo.tools.config.parse_config(['-d', args.database] + (['-c', args.config] if args.config else []))
+    registry = Registry(args.database)
+    with registry.cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        if args.generate:
+            generate_data(env, args.partners, args.orders, args.lines, args.seed)
+            cr.commit()
+        names = [name for name in SCENARIOS if not args.only or args.only in name]
+        results = run(env, names, args.repeat)
+        cr.rollback()
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        report(results, {})
+        return 0
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        baseline = {}
+    report(results, baseline)
+    regressions = compare(results, baseline)
+    for name, metric, before, after in regressions:
+        print("REGRESSION %s %s: %s -> %s" % (name, metric, before, after))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+# ============================================
+# ODOO ORM METRICS & TRACING
+# ============================================
+# Always-on, low-overhead telemetry for the operations of Search.py and
+# Write.py: per model and method, a call counter, a latency histogram, the
+# number of SQL queries and the number of records handled.
+#
+#   search, search_read, search_count, create, write, unlink,
+#   recompute (stored computed fields), constraints (@api.constrains)
+#
+# Prometheus: GET /metrics (text format, all workers aggregated; the totals
+# of recycled workers are kept, so counters never go down)
+#   [options]
+#   metrics_token = secret          # required as "Authorization: Bearer secret"
+#
+# OpenTelemetry: install opentelemetry-api/sdk and configure an exporter;
+# a sampled fraction of the calls become spans "<model>.<method>"
+#   [options]
+#   metrics_sample_rate = 0.01      # 1% of the calls are traced
+#
+# Cost when not traced: two perf_counter() calls and one dict update per call.
+
+import fcntl
+import hmac
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from odoo import api, http, models
+from odoo.tools import config
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+_logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Each worker saves its metrics for /metrics at most this often, in seconds
+DUMP_INTERVAL = 10
+
+# (model, method) -> [calls, seconds, queries, records, bucket counts...]
+_metrics = {}
+_metrics_lock = threading.Lock()
+_last_dump = [0.0]
+
+
+# ============================================
+# 1. RECORDING
+# ============================================
+def _observe(records, method, call, size=len):
+    """ Run ``call()`` for ``method`` on ``records``, record its metrics and
+    return its result. ``size(result)`` gives the number of records handled.
+    """
+    cr = records.env.cr
+    span = None
+    if trace is not None and random.random() < float(config.get('metrics_sample_rate') or 0):
+        span = trace.get_tracer('odoo.orm').start_span(
+            '%s.%s' % (records._name, method),
+            attributes={'odoo.model': records._name, 'odoo.method': method},
+        )
+    queries = cr.sql_log_count
+    start = time.perf_counter()
+    count = 0
+    try:
+        result = call()
+        count = size(result)
+        return result
+    finally:
+        duration = time.perf_counter() - start
+        queries = cr.sql_log_count - queries
+        key = (records._name, method)
+        with _metrics_lock:
+            series = _metrics.get(key)
+            if series is None:
+                series = _metrics[key] = [0, 0.0, 0, 0] + [0] * len(BUCKETS)
+            series[0] += 1
+            series[1] += duration
+            series[2] += queries
+            series[3] += count
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    series[4 + index] += 1
+                    break
+        if span is not None:
+            span.set_attribute('odoo.sql_queries', queries)
+            span.set_attribute('odoo.records', count)
+            span.end()
+        if time.monotonic() - _last_dump[0] > DUMP_INTERVAL:
+            _dump_metrics()
+
+
+def _metrics_dir():
+    return os.path.join(config['data_dir'], 'orm_metrics')
+
+
+def _dump_metrics():
+    """ Save the metrics of this process, for /metrics in any worker. """
+    _last_dump[0] = time.monotonic()
+    with _metrics_lock:
+        snapshot = [[model, method] + series for (model, method), series in _metrics.items()]
+    try:
+        os.makedirs(_metrics_dir(), exist_ok=True)
+        path = os.path.join(_metrics_dir(), '%d.json' % os.getpid())
+        with open(path + '.tmp', 'w') as file:
+            json.dump(snapshot, file)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        _logger.warning("Could not save ORM metrics", exc_info=True)
+
+
+def _read_rows(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def _add_rows(total, rows):
+    for model, method, *series in rows:
+        current = total.setdefault((model, method), [0] * len(series))
+        for index, value in enumerate(series):
+            current[index] += value
+
+
+def _retire_metrics(path, retired):
+    """ Move the metrics of a dead worker into the ``retired`` totals: the
+    sums must never go down, Prometheus would read it as a counter reset.
+    """
+    try:
+        rows = _read_rows(path)
+    except ValueError:
+        rows = []
+    total = {}
+    try:
+        _add_rows(total, _read_rows(retired))
+    except FileNotFoundError:
+        pass
+    _add_rows(total, rows)
+    with open(retired + '.tmp', 'w') as file:
+        json.dump([[model, method] + series for (model, method), series in total.items()], file)
+    os.replace(retired + '.tmp', retired)
+    os.unlink(path)
+
+
+def _collect_metrics():
+    """ Return the metrics of all the processes, live and dead, summed. """
+    _dump_metrics()
+    total = {}
+    retired = os.path.join(_metrics_dir(), 'retired.totals')
+    with open(os.path.join(_metrics_dir(), 'collect.lock'), 'w') as lock:
+        # Workers may collect at the same time: a dead worker's file must be
+        # retired once, and never be counted both as a file and as retired
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for filename in os.listdir(_metrics_dir()):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(_metrics_dir(), filename)
+            try:
+                os.kill(int(filename[:-5]), 0)
+            except (ProcessLookupError, ValueError):
+                # The worker is gone (recycled): its last totals are kept
+                try:
+                    _retire_metrics(path, retired)
+                except OSError:
+                    _logger.warning("Could not retire ORM metrics %s", path, exc_info=True)
+                continue
+            except PermissionError:
+                pass
+            try:
+                _add_rows(total, _read_rows(path))
+            except (OSError, ValueError):
+                continue
+        try:
+            _add_rows(total, _read_rows(retired))
+        except (OSError, ValueError):
+            pass
+    return total
+
+
+# ============================================
+# 2. PROMETHEUS TEXT FORMAT
+# ============================================
+def render_prometheus(metrics):
+    lines = [
+        '# HELP odoo_orm_calls_total ORM calls.',
+        '# TYPE odoo_orm_calls_total counter',
+    ]
+    labels = {key: 'model="%s",method="%s"' % key for key in metrics}
+    for key, series in sorted(metrics.items()):
+        lines.append('odoo_orm_calls_total{%s} %d' % (labels[key], series[0]))
+    lines += [
+        '# HELP odoo_orm_sql_queries_total SQL queries run by ORM calls.',
+        '# TYPE odoo_orm_sql_queries_total counter',
+    ]
+    for key, series in sorted(metrics.items()):
+        lines.append('odoo_orm_sql_queries_total{%s} %d' % (labels[key], series[2]))
+    lines += [
+        '# HELP odoo_orm_records_total Records returned or modified by ORM calls.',
+        '# TYPE odoo_orm_records_total counter',
+    ]
+    for key, series in sorted(metrics.items()):
+        lines.append('odoo_orm_records_total{%s} %d' % (labels[key], series[3]))
+    lines += [
+        '# HELP odoo_orm_call_duration_seconds Latency of ORM calls.',
+        '# TYPE odoo_orm_call_duration_seconds histogram',
+    ]
+    for key, series in sorted(metrics.items()):
+        cumulated = 0
+        for bound, count in zip(BUCKETS, series[4:]):
+            cumulated += count
+            lines.append('odoo_orm_call_duration_seconds_bucket{%s,le="%s"} %d' % (labels[key], bound, cumulated))
+        lines.append('odoo_orm_call_duration_seconds_bucket{%s,le="+Inf"} %d' % (labels[key], series[0]))
+        lines.append('odoo_orm_call_duration_seconds_sum{%s} %.6f' % (labels[key], series[1]))
+        lines.append('odoo_orm_call_duration_seconds_count{%s} %d' % (labels[key], series[0]))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsController(http.Controller):
+
+    @http.route('/metrics', type='http', auth='none', methods=['GET'], save_session=False)
+    def metrics(self):
+        token = config.get('metrics_token')
+        authorization = http.request.httprequest.headers.get('Authorization') or ''
+        # Constant time: the comparison must not leak how much of the token matched
+        if not token or not hmac.compare_digest(authorization.encode(), ('Bearer %s' % token).encode()):
+            return http.Response(status=403)
+        return http.Response(
+            render_prometheus(_collect_metrics()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
+# ============================================
+# 3. INSTRUMENTED ORM METHODS
+# ============================================
+class BaseMetrics(models.AbstractModel):
+    _inherit = 'base'
+
+    @api.model
+    def search(self, domain, offset=0, limit=None, order=None):
+        return _observe(self, 'search', lambda: super(BaseMetrics, self).search(
+            domain, offset=offset, limit=limit, order=order,
+        ))
+
+    @api.model
+    def search_read(self, domain=None, fields=None, offset=0, limit=None, order=None, **read_kwargs):
+        return _observe(self, 'search_read', lambda: super(BaseMetrics, self).search_read(
+            domain, fields, offset=offset, limit=limit, order=order, **read_kwargs,
+        ))
+
+    @api.model
+    def search_count(self, domain, limit=None):
+        return _observe(self, 'search_count', lambda: super(BaseMetrics, self).search_count(
+            domain, limit=limit,
+        ), size=lambda count: 0)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        return _observe(self, 'create', lambda: super(BaseMetrics, self).create(vals_list))
+
+    def write(self, vals):
+        return _observe(self, 'write', lambda: super(BaseMetrics, self).write(vals), size=lambda _: len(self))
+
+    def unlink(self):
+        count = len(self)
+        return _observe(self, 'unlink', lambda: super(BaseMetrics, self).unlink(), size=lambda _: count)
+
+    def _recompute_field(self, field, ids=None):
+        return _observe(self, 'recompute', lambda: super(BaseMetrics, self)._recompute_field(
+            field, ids=ids,
+        ), size=lambda _: len(ids) if ids is not None else 0)
+
+    def _validate_fields(self, field_names, excluded_names=()):
+        return _observe(self, 'constraints', lambda: super(BaseMetrics, self)._validate_fields(
+            field_names, excluded_names,
+        ), size=lambda _: len(self))
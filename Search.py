@@ -2,7 +2,25 @@
 # ODOO ORM SEARCH - COMPLETE GUIDE
 # ============================================
 
-from odoo import models, fields, api
+import collections
+import hashlib
+import json
+import logging
+import random
+import re
+import select
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+from odoo import models, fields, api, exceptions, sql_db
+from odoo.osv import expression
+from odoo.tools import SQL, config
+from odoo.tools.sql import table_exists
+
+_logger = logging.getLogger(__name__)
 
 class SearchExamples(models.Model):
     _name = 'search.examples'
@@ -355,4 +373,1285 @@ class SearchExamples(models.Model):
         no_records = self.env['res.partner'].search([(0, '=', 1)])
         
         # Include archived records
-        partners = self.env['res.partner'].with_context(active_test=False).search([])
\ No newline at end of file
+        partners = self.env['res.partner'].with_context(active_test=False).search([])
+
+    # ============================================
+    # 13. FINDING MISSING INDEXES
+    # ============================================
+    def index_advisor(self):
+        # Every pattern above needs a different index:
+        # - ('name', 'ilike', '%john%')             -> trigram (GIN gin_trgm_ops)
+        # - ('date_order', '>=', ...) ranges        -> btree, last in a composite
+        # - ('state', 'in', [...])                  -> btree, first in a composite
+        # - ('active', '=', True)                   -> partial index WHERE active
+        # - ('partner_id.country_id.code', ...)     -> one btree per hop of the path
+
+        # 1. Turn on sampling in the server config (fraction of search calls)
+        #    [options]
+        #    domain_sample_rate = 0.01
+        # Sampled search()/search_read()/search_count() calls record their
+        # domain SHAPE (values stripped) with frequency and latency
+
+        # 2. Every worker saves its samples to search.domain.shape once a
+        #    minute; to save the samples of this worker right now:
+        self.env['search.domain.shape']._flush_domain_stats()
+
+        # 3. Read the report: hottest shapes first, with recommended indexes
+        report = self.env['search.domain.shape'].index_advisor_report(limit=20)
+        for line in report:
+            print(line['model'], line['shape'], line['count'], line['avg_ms'])
+            for recommendation in line['recommendations']:
+                print('   ', recommendation['ddl'], recommendation['reason'])
+                # cost_before / cost_after come from EXPLAIN
+                # (cost_after needs the hypopg extension, None otherwise)
+
+        # 4. Opt in: create the recommended indexes (locks writes on the table!)
+        # (the indexes of a shape are recomputed, its id is all it takes)
+        self.env['search.domain.shape'].browse(report[0]['id'])._apply_index_recommendations()
+
+    # ============================================
+    # 14. DASHBOARD ROLLUPS (read_group BY DATE)
+    # ============================================
+    def dashboard_rollups(self):
+        # Dashboards aggregate the same big table again and again
+        revenue = self.env['sale.order'].read_group(
+            [('state', '=', 'sale'), ('date_order', '>=', '2024-01-01')],
+            ['amount_total:sum'],
+            ['date_order:month', 'state'],
+        )
+
+        # ✅ GOOD - Declare a rollup table on the model
+        # class SaleOrder(models.Model):
+        #     _inherit = 'sale.order'
+        #     _rollups = {
+        #         'sale_order_month': {
+        #             'groupby': ['date_order:month', 'state', 'partner_id', 'company_id'],
+        #             'measures': ['amount_total'],
+        #             'tz': 'Europe/Brussels',    # timezone of the date buckets
+        #         },
+        #     }
+        # - create/write/unlink (and recomputes) apply their delta to the rollup
+        # - read_group() reads the rollup when its groupby, aggregates and
+        #   domain (including record rules) only use the rollup's columns
+        # - Date filters must fall on bucket boundaries: '>=' / '<' the 1st of a month
+        # - Coarser buckets are derived: a month rollup also answers quarter/year
+        # - Supported aggregates: '__count' and '<measure>:sum'
+        # - company_id is in the groupby so the multi-company rule can be applied
+        # - Sorting groups by a many2one follows the comodel's _order: such
+        #   read_group() calls use the regular query
+        # - Changing the declaration rebuilds the table (at update or first use)
+
+        # Rebuild from scratch (after deploy, or after raw SQL changes)
+        self.env['sale.order'].rollup_rebuild('sale_order_month')
+
+        # Compare the rollup with a fresh aggregation (returns the differences)
+        mismatches = self.env['sale.order'].rollup_check('sale_order_month')
+
+    # ============================================
+    # 15. SEARCH RESULT CACHE
+    # ============================================
+    def search_cache(self):
+        # Hot paths repeat the exact same queries
+        quotations = self.env['sale.order'].search([('state', 'in', ['draft', 'sent'])])
+        last_order = self.env['sale.order'].search([], order='id DESC', limit=1)
+
+        # 1. Turn the cache on in the server config (max entries per worker)
+        #    [options]
+        #    search_cache_size = 10000
+
+        # 2. Opt in per call...
+        quotations = self.env['sale.order'].with_context(search_cache=True).search([
+            ('state', 'in', ['draft', 'sent'])
+        ])
+        count = self.env['sale.order'].with_context(search_cache=True).search_count([
+            ('state', '=', 'draft')
+        ])
+        # ...or per model: _search_cache = True on the model class
+
+        # The key is (model, normalized domain, order, limit, offset, user,
+        # companies, active_test, lang), so access rights never leak.
+        # An entry is dropped when create/unlink touch one of the models it
+        # depends on, or write touches one of its fields, dotted paths included:
+        # ('partner_id.country_id.code', '=', 'US') depends on
+        # sale.order.partner_id, res.partner.country_id and res.country.code.
+        # Other workers are told through PostgreSQL NOTIFY once the change is
+        # committed, like the bus does.
+
+        # Never cached: domains on non-stored fields with a custom search method
+
+    # ============================================
+    # 16. LAZY SEARCH (ONE QUERY FOR THE WHOLE CHAIN)
+    # ============================================
+    def lazy_search(self):
+        # ❌ SLOW - search() runs right away, the rest is done in Python
+        partner_names = self.env['res.partner'].search([
+            ('customer', '=', True)
+        ]).filtered(lambda p: p.country_id.code == 'US').mapped('name')
+
+        # ✅ FAST - search_lazy() builds the query, it runs on first use
+        partner_names = self.env['res.partner'].search_lazy([
+            ('customer', '=', True)
+        ]).filtered_domain([('country_id.code', '=', 'US')]).sorted('name').limit(10).mapped('name')
+        for name in partner_names:      # <- the query runs here, once:
+            print(name)                 # SELECT name FROM res_partner WHERE ... ORDER BY name LIMIT 10
+
+        # len() and bool() run the query too; exists() runs a LIMIT 1 query
+        # and returns True/False
+        query = self.env['res.partner'].search_lazy([('customer', '=', True)])
+        if query.exists():
+            print(len(query))
+
+        # Folded into SQL: filtered_domain(), sorted('name desc'), limit(),
+        # mapped('field') on a stored field, exists()
+        # Evaluated, then done in Python (same result as on a recordset):
+        # filtered(lambda), sorted(key=lambda), mapped('a.b'), and any
+        # filtered_domain()/sorted() called after limit()
+
+    # ============================================
+    # 17. FAST ILIKE ON NAMES (TRIGRAM INDEXES)
+    # ============================================
+    def trigram_search(self):
+        # Without an index these are sequential scans on the whole table
+        partners = self.env['res.partner'].search([('name', 'ilike', '%john%')])
+        partners = self.env['res.partner'].search([('name', 'not ilike', '%test%')])
+        products = self.env['product.product'].search([('categ_id.name', 'ilike', 'electronics')])
+
+        # ✅ Declare a trigram index on the field (char, text or translated)
+        # class ProductCategory(models.Model):
+        #     _inherit = 'product.category'
+        #     name = fields.Char(index='trigram')
+        # Then update the module (-u): Odoo creates ONE gin index per field
+        # - plain field:      gin ("name" gin_trgm_ops)
+        # - translated field: gin ((jsonb_path_query_array("name", '$.*')::text) gin_trgm_ops),
+        #                     all the languages in one index
+        # like / ilike / =like / =ilike use it; on a translated field the
+        # search checks the index expression, then the user's language
+        # - unaccent = True in the config: the searches go through unaccent(),
+        #   and the index too when unaccent() is IMMUTABLE in the database
+        # not like / not ilike cannot use an index: keep them for small sets
+
+
+# ============================================
+# DOMAIN SHAPE RECORDER & INDEX ADVISOR
+# ============================================
+# (dbname, model, shape) -> [count, total seconds, last domain], per worker
+_domain_stats = {}
+_domain_stats_lock = threading.Lock()
+# Each worker saves its samples to the table at most this often, in seconds
+DOMAIN_STATS_INTERVAL = 60
+_domain_stats_saved = [time.monotonic()]
+
+
+def _domain_shape(domain):
+    """ Return the domain with its values replaced by their kind, e.g.
+    ``[('name', 'ilike', '%john%')]`` -> ``[('name', 'ilike', 'contains')]``.
+    """
+    shape = []
+    for element in domain:
+        if not isinstance(element, (list, tuple)):
+            shape.append(element)
+            continue
+        path, operator, value = element
+        if value is False or value is None:
+            kind = 'null'
+        elif isinstance(value, (list, tuple)):
+            kind = 'list'
+        elif isinstance(value, str) and 'like' in operator:
+            # like/ilike wrap the value in %...%, =like/=ilike use it as is
+            prefix = operator.startswith('=') and not value.startswith(('%', '_'))
+            kind = 'prefix' if prefix else 'contains'
+        else:
+            kind = 'value'
+        shape.append((str(path), operator, kind))
+    return shape
+
+
+def _record_domain(model, domain, duration):
+    """ Record a search on ``model`` (a recordset), and save the samples of
+    this worker when they are older than ``DOMAIN_STATS_INTERVAL``.
+    """
+    if not domain:
+        return
+    key = (model.env.cr.dbname, model._name, json.dumps(_domain_shape(domain)))
+    with _domain_stats_lock:
+        stats = _domain_stats.setdefault(key, [0, 0.0, None])
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] = domain
+        if time.monotonic() - _domain_stats_saved[0] < DOMAIN_STATS_INTERVAL:
+            return
+        _domain_stats_saved[0] = time.monotonic()
+    if not model.pool.ready or 'search.domain.shape' not in model.env:
+        return
+    try:
+        # In its own transaction: the samples don't depend on the caller's
+        with model.pool.cursor() as cr:
+            model.env(cr=cr, su=True)['search.domain.shape']._flush_domain_stats()
+    except Exception:
+        _logger.warning("Could not save the domain samples", exc_info=True)
+
+
+def _index_columns(indexdef):
+    """ Parse ``CREATE INDEX ... USING method (col1, col2 opclass, ...)`` as
+    ``(method, [(column, opclass or None)])``; expressions that only cast a
+    column, like ``((name)::text)``, count as the column.
+    """
+    _head, _, tail = indexdef.partition(' USING ')
+    method, _, rest = tail.partition(' ')
+    elements, current, depth = [], '', 0
+    for char in rest:
+        if char == '(':
+            depth += 1
+            if depth == 1:
+                continue
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                elements.append(current)
+                break
+        elif char == ',' and depth == 1:
+            elements.append(current)
+            current = ''
+            continue
+        current += char
+    columns = []
+    for element in elements:
+        element = re.sub(r'\s+(ASC|DESC)?(\s*NULLS\s+(FIRST|LAST))?$', '', element.strip())
+        opclass = None
+        if ' ' in element and not element.endswith(')'):
+            element, opclass = element.rsplit(' ', 1)
+        columns.append((re.sub(r'::[\w ]+|"', '', element).strip().strip('()'), opclass))
+    return method, columns
+
+
+class BaseSearchExtensions(models.AbstractModel):
+    _inherit = 'base'
+
+    def search_fetch(self, domain, field_names, offset=0, limit=None, order=None):
+        # search() and search_read() both end up here
+        if random.random() >= float(config.get('domain_sample_rate') or 0):
+            return super().search_fetch(domain, field_names, offset=offset, limit=limit, order=order)
+        start = time.perf_counter()
+        result = super().search_fetch(domain, field_names, offset=offset, limit=limit, order=order)
+        _record_domain(self, domain, time.perf_counter() - start)
+        return result
+
+    @api.model
+    def search_count(self, domain, limit=None):
+        if random.random() >= float(config.get('domain_sample_rate') or 0):
+            return super().search_count(domain, limit=limit)
+        start = time.perf_counter()
+        result = super().search_count(domain, limit=limit)
+        _record_domain(self, domain, time.perf_counter() - start)
+        return result
+
+
+class SearchDomainShape(models.Model):
+    _name = 'search.domain.shape'
+    _description = 'Sampled Search Domain Shape'
+    _order = 'total_ms DESC'
+
+    model = fields.Char(required=True)
+    shape = fields.Char(required=True)
+    count = fields.Integer()
+    total_ms = fields.Float()
+    sample_domain = fields.Char()
+
+    _sql_constraints = [
+        ('model_shape_uniq', 'unique(model, shape)', 'A domain shape is recorded once per model.'),
+    ]
+
+    @api.model
+    def _flush_domain_stats(self):
+        """ Move the samples of this worker into the table. """
+        dbname = self.env.cr.dbname
+        with _domain_stats_lock:
+            stats = {key[1:]: _domain_stats.pop(key) for key in list(_domain_stats) if key[0] == dbname}
+        if not stats:
+            return
+        self.env.cr.execute("""
+            INSERT INTO search_domain_shape (model, shape, count, total_ms, sample_domain)
+            VALUES {}
+            ON CONFLICT (model, shape) DO UPDATE SET
+                count = search_domain_shape.count + EXCLUDED.count,
+                total_ms = search_domain_shape.total_ms + EXCLUDED.total_ms,
+                sample_domain = EXCLUDED.sample_domain
+        """.format(", ".join(["%s"] * len(stats))), [
+            (model, shape, count, total * 1000, json.dumps(domain, default=str))
+            for (model, shape), (count, total, domain) in stats.items()
+        ])
+        self.invalidate_model()
+
+    @api.model
+    def index_advisor_report(self, limit=20):
+        """ Return the hottest domain shapes with their recommended indexes. """
+        report = []
+        for line in self.search([], limit=limit):
+            if line.model not in self.env:
+                continue
+            domain = json.loads(line.sample_domain)
+            recommendations = self._recommend_indexes(self.env[line.model], json.loads(line.shape))
+            self._estimate_benefit(self.env[line.model], domain, recommendations)
+            report.append({
+                'id': line.id,
+                'model': line.model,
+                'shape': line.shape,
+                'count': line.count,
+                'total_ms': line.total_ms,
+                'avg_ms': line.total_ms / line.count if line.count else 0.0,
+                'recommendations': recommendations,
+            })
+        return report
+
+    @api.model
+    def _recommend_indexes(self, model, shape):
+        recommendations = []
+        equal_columns, range_columns = [], []
+        active = 'active' in model._fields and model._active_name == 'active'
+        for leaf in shape:
+            if not isinstance(leaf, list):
+                continue
+            path, operator, kind = leaf
+            fnames = path.split('.')
+            # Every many2one hop of a dotted path is a separate lookup
+            current = model
+            for fname in fnames[:-1]:
+                field = current._fields.get(fname)
+                if field is None or field.type != 'many2one' or not field.store:
+                    current = None
+                    break
+                if current is model:
+                    equal_columns.append(fname)
+                else:
+                    recommendations.append(self._index(current, [fname], reason="path %s" % path))
+                current = self.env[field.comodel_name]
+            if current is None:
+                continue
+            field = current._fields.get(fnames[-1])
+            if field is None or not field.store or not field.column_type:
+                continue
+            if operator.startswith('not ') or operator in ('!=', '<>'):
+                continue  # negations never use an index
+            if 'like' in operator:
+                recommendations.append(self._index(
+                    current, [field.name], method='gin', opclass='gin_trgm_ops',
+                    reason="%s on %s needs a trigram index (pg_trgm)" % (operator, path),
+                ))
+            elif current is not model:
+                recommendations.append(self._index(current, [field.name], reason="path %s" % path))
+            elif field.name == 'active':
+                active = True
+            elif operator in ('=', 'in', 'child_of', 'parent_of'):
+                equal_columns.append(field.name)
+            elif operator in ('<', '<=', '>', '>='):
+                range_columns.append(field.name)
+
+        # Equalities first, then a single range column, restricted to active rows
+        columns = list(dict.fromkeys(equal_columns)) + range_columns[:1]
+        if columns:
+            recommendations.insert(0, self._index(
+                model, columns, where='active' if active else None,
+                reason="composite btree for %s" % ", ".join(columns) if len(columns) > 1 else "btree",
+            ))
+        return [rec for rec in recommendations if not self._index_exists(rec)]
+
+    @api.model
+    def _index(self, model, columns, method='btree', opclass=None, where=None, reason=''):
+        name = "%s_%s_%s" % (model._table, "_".join(columns), 'partial' if where else method)
+        name = name[:59] + '_idx'
+        expression = ", ".join(
+            '"%s" %s' % (column, opclass) if opclass else '"%s"' % column
+            for column in columns
+        )
+        ddl = 'CREATE INDEX IF NOT EXISTS "%s" ON "%s" USING %s (%s)%s' % (
+            name, model._table, method, expression, " WHERE %s" % where if where else "",
+        )
+        return {
+            'table': model._table, 'columns': columns, 'method': method, 'opclass': opclass, 'where': where,
+            'expression': expression, 'ddl': ddl, 'reason': reason,
+            'cost_before': None, 'cost_after': None,
+        }
+
+    @api.model
+    def _index_exists(self, recommendation):
+        """ Whether an index of the table already serves the recommendation:
+        a btree starting with its columns, or a gin on the same columns and
+        operator class.
+        """
+        self.env.cr.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s", [recommendation['table']])
+        wanted = [(column, recommendation['opclass']) for column in recommendation['columns']]
+        for indexdef, in self.env.cr.fetchall():
+            method, columns = _index_columns(indexdef)
+            if method != recommendation['method']:
+                continue
+            if method == 'btree':
+                if [column for column, _opclass in columns[:len(wanted)]] == recommendation['columns']:
+                    return True
+            elif columns == wanted:
+                return True
+        return False
+
+    @api.model
+    def _explain_cost(self, model, domain):
+        self.env.cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", model._search(domain).select()))
+        return self.env.cr.fetchone()[0][0]['Plan']['Total Cost']
+
+    @api.model
+    def _estimate_benefit(self, model, domain, recommendations):
+        """ Fill in the EXPLAIN cost before and, with hypopg, after each index. """
+        cost = self._explain_cost(model, domain)
+        self.env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'hypopg'")
+        hypopg = bool(self.env.cr.rowcount)
+        for recommendation in recommendations:
+            recommendation['cost_before'] = cost
+            if hypopg:
+                self.env.cr.execute("SELECT * FROM hypopg_create_index(%s)", [recommendation['ddl']])
+                recommendation['cost_after'] = self._explain_cost(model, domain)
+                self.env.cr.execute("SELECT hypopg_reset()")
+
+    def _apply_index_recommendations(self):
+        """ Create the recommended indexes of the shapes ``self``. Opt-in
+        only: CREATE INDEX blocks writes on the table while it runs. The DDL
+        is rebuilt from the recorded shapes, like the report does.
+        """
+        if not self.env.is_superuser() and not self.env.user.has_group('base.group_system'):
+            raise exceptions.AccessError("Only administrators can create indexes.")
+        for line in self:
+            if line.model not in self.env:
+                continue
+            for recommendation in self._recommend_indexes(self.env[line.model], json.loads(line.shape)):
+                if recommendation['method'] == 'gin':
+                    self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                self.env.cr.execute(recommendation['ddl'])
+
+# ============================================
+# ROLLUP TABLES FOR read_group
+# ============================================
+# From finest to coarsest: each bucket is contained in the next one
+ROLLUP_GRANULARITIES = ('day', 'month', 'quarter', 'year')
+
+
+class BaseRollups(models.AbstractModel):
+    _inherit = 'base'
+
+    # {name: {'groupby': [...], 'measures': [...], 'tz': 'UTC'}}, see dashboard_rollups()
+    _rollups = {}
+
+    def _auto_init(self):
+        result = super()._auto_init()
+        for name in self._rollups:
+            self._rollup_create_table(name)
+        return result
+
+    # --------------------------------------------
+    # Declaration
+    # --------------------------------------------
+    def _rollup_specs(self, name):
+        """ Return ``[(column, fname, granularity)]`` for the groupby of a rollup. """
+        specs = []
+        for spec in self._rollups[name]['groupby']:
+            fname, _, granularity = spec.partition(':')
+            field = self._fields[fname]
+            if field.type in ('date', 'datetime'):
+                granularity = granularity or 'month'
+                if granularity not in ROLLUP_GRANULARITIES:
+                    raise ValueError("Rollup %s: unsupported granularity %r" % (name, granularity))
+            specs.append(("%s_%s" % (fname, granularity) if granularity else fname, fname, granularity or None))
+        return specs
+
+    def _rollup_group_expressions(self, name):
+        tz = self._rollups[name].get('tz') or 'UTC'
+        expressions = []
+        for _column, fname, granularity in self._rollup_specs(name):
+            expression = SQL.identifier(self._table, fname)
+            if granularity and self._fields[fname].type == 'datetime':
+                expression = SQL("timezone(%s, timezone('UTC', %s))", tz, expression)
+            if granularity:
+                expression = SQL("date_trunc(%s, %s)::date", granularity, expression)
+            expressions.append(expression)
+        return expressions
+
+    def _rollup_signature(self, name):
+        """ Hash of the declaration of rollup ``name``, kept as the comment of
+        its table: the table is rebuilt when the declaration changes.
+        """
+        return hashlib.sha1(json.dumps([
+            [(column, self._fields[fname].column_type, granularity)
+             for column, fname, granularity in self._rollup_specs(name)],
+            list(self._rollups[name]['measures']),
+            self._rollups[name].get('tz') or 'UTC',
+        ]).encode()).hexdigest()
+
+    def _rollup_create_table(self, name):
+        """ Create the table of rollup ``name``, or recreate it if its
+        declaration changed. Return whether the table was (re)built.
+        """
+        # Checked once per registry, then trusted by _rollup_apply()
+        if not hasattr(self.pool, '_rollup_tables_checked'):
+            self.pool._rollup_tables_checked = set()
+        self.pool._rollup_tables_checked.add(name)
+        cr = self.env.cr
+        table = "rollup_%s" % name
+        signature = self._rollup_signature(name)
+        if table_exists(cr, table):
+            cr.execute("SELECT obj_description(%s::regclass, 'pg_class')", [table])
+            if cr.fetchone()[0] == signature:
+                return False
+            _logger.info("Rollup %s was changed: rebuilding table %s", name, table)
+            cr.execute(SQL("DROP TABLE %s", SQL.identifier(table)))
+        columns = [SQL("key text PRIMARY KEY")]
+        for column, fname, granularity in self._rollup_specs(name):
+            column_type = 'date' if granularity else self._fields[fname].column_type[1]
+            columns.append(SQL("%s %s", SQL.identifier(column), SQL(column_type)))
+        for measure in self._rollups[name]['measures']:
+            columns.append(SQL("%s numeric NOT NULL DEFAULT 0", SQL.identifier("%s_sum" % measure)))
+        columns.append(SQL("count integer NOT NULL DEFAULT 0"))
+        cr.execute(SQL("CREATE TABLE %s (%s)", SQL.identifier(table), SQL(", ").join(columns)))
+        cr.execute(SQL("COMMENT ON TABLE %s IS %s", SQL.identifier(table), signature))
+        self._rollup_apply(name, 1, all_records=True)
+        return True
+
+    # --------------------------------------------
+    # Incremental maintenance
+    # --------------------------------------------
+    def _rollup_apply(self, name, sign, all_records=False):
+        """ Add (``sign=1``) or remove (``sign=-1``) the rows of ``self``, as
+        they currently are in the database, to/from the rollup ``name``.
+        """
+        if not (self or all_records):
+            return
+        if name not in getattr(self.pool, '_rollup_tables_checked', ()):
+            if self._rollup_create_table(name) and sign > 0:
+                # Just built from the table, which already holds these rows
+                return
+        rollup = SQL.identifier("rollup_%s" % name)
+        specs = self._rollup_specs(name)
+        groups = SQL(", ").join(self._rollup_group_expressions(name))
+        measures = self._rollups[name]['measures']
+        sum_columns = [SQL.identifier("%s_sum" % measure) for measure in measures]
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO %(rollup)s (key, %(columns)s, %(sum_columns)s, count)
+            SELECT row(%(groups)s)::text, %(groups)s, %(sums)s, %(sign)s * COUNT(*)
+            FROM %(table)s
+            WHERE %(where)s
+            GROUP BY %(groups)s
+            ON CONFLICT (key) DO UPDATE SET %(updates)s, count = %(rollup)s.count + EXCLUDED.count
+            """,
+            rollup=rollup,
+            columns=SQL(", ").join(SQL.identifier(column) for column, _fname, _granularity in specs),
+            sum_columns=SQL(", ").join(sum_columns),
+            groups=groups,
+            sums=SQL(", ").join(
+                SQL("%s * COALESCE(SUM(%s), 0)", sign, SQL.identifier(self._table, measure))
+                for measure in measures
+            ),
+            sign=sign,
+            table=SQL.identifier(self._table),
+            where=SQL("TRUE") if all_records else SQL("%s IN %s", SQL.identifier(self._table, 'id'), tuple(self.ids)),
+            updates=SQL(", ").join(
+                SQL("%s = %s.%s + EXCLUDED.%s", column, rollup, column, column)
+                for column in sum_columns
+            ),
+        ))
+        if sign < 0:
+            self.env.cr.execute(SQL("DELETE FROM %s WHERE count = 0", rollup))
+
+    def _rollups_touching(self, fnames):
+        return [
+            name for name, rollup in self._rollups.items()
+            if any(fname in fnames for fname in rollup['measures'])
+            or any(fname in fnames for _column, fname, _granularity in self._rollup_specs(name))
+        ]
+
+    @api.model
+    def _create(self, data_list):
+        records = super()._create(data_list)
+        for name in self._rollups:
+            records._rollup_apply(name, 1)
+        return records
+
+    def _write(self, vals):
+        # Every stored value goes through _write, recomputed fields included,
+        # and the database still holds the old values at this point
+        names = self._rollups_touching(vals) if self._rollups else []
+        for name in names:
+            self._rollup_apply(name, -1)
+        result = super()._write(vals)
+        for name in names:
+            self._rollup_apply(name, 1)
+        return result
+
+    def unlink(self):
+        if self._rollups and self:
+            self.flush_recordset()
+            for name in self._rollups:
+                self._rollup_apply(name, -1)
+        # Rows removed by ON DELETE CASCADE bypass this: see rollup_check()
+        return super().unlink()
+
+    # --------------------------------------------
+    # Rebuild & consistency check
+    # --------------------------------------------
+    def _rollup_check_admin(self):
+        if not self.env.is_superuser() and not self.env.user.has_group('base.group_system'):
+            raise exceptions.AccessError("Only administrators can manage rollup tables.")
+
+    @api.model
+    def rollup_rebuild(self, name=None):
+        """ Recompute the rollup ``name`` (all rollups of the model by default)
+        from the model's table.
+        """
+        self._rollup_check_admin()
+        self.flush_model()
+        for name in [name] if name else list(self._rollups):
+            if self._rollup_create_table(name):
+                continue
+            self.env.cr.execute(SQL("TRUNCATE %s", SQL.identifier("rollup_%s" % name)))
+            self._rollup_apply(name, 1, all_records=True)
+
+    @api.model
+    def rollup_check(self, name=None):
+        """ Compare rollups with a fresh aggregation of the model's table.
+
+        :return: list of ``{'rollup', 'key', 'expected', 'actual'}`` for every
+            bucket that differs, empty when the rollups are consistent
+        """
+        self._rollup_check_admin()
+        self.flush_model()
+        mismatches = []
+        for name in [name] if name else list(self._rollups):
+            groups = SQL(", ").join(self._rollup_group_expressions(name))
+            measures = self._rollups[name]['measures']
+            values = SQL(", ").join(
+                [SQL("COALESCE(SUM(%s), 0)", SQL.identifier(self._table, measure)) for measure in measures]
+                + [SQL("COUNT(*)")]
+            )
+            rollup_values = SQL(", ").join(
+                [SQL.identifier("r", "%s_sum" % measure) for measure in measures]
+                + [SQL.identifier("r", "count")]
+            )
+            self.env.cr.execute(SQL(
+                """
+                WITH fresh AS (
+                    SELECT row(%(groups)s)::text AS key, ARRAY[%(values)s]::numeric[] AS vals
+                    FROM %(table)s GROUP BY %(groups)s
+                )
+                SELECT COALESCE(f.key, r.key), f.vals, ARRAY[%(rollup_values)s]::numeric[]
+                FROM fresh f FULL OUTER JOIN %(rollup)s r ON r.key = f.key
+                WHERE f.vals IS DISTINCT FROM ARRAY[%(rollup_values)s]::numeric[]
+                """,
+                groups=groups,
+                values=values,
+                table=SQL.identifier(self._table),
+                rollup_values=rollup_values,
+                rollup=SQL.identifier("rollup_%s" % name),
+            ))
+            mismatches.extend(
+                {'rollup': name, 'key': key, 'expected': expected, 'actual': actual}
+                for key, expected, actual in self.env.cr.fetchall()
+            )
+        return mismatches
+
+    # --------------------------------------------
+    # read_group
+    # --------------------------------------------
+    @api.model
+    def _read_group(self, domain, groupby=(), aggregates=(), having=(), offset=0, limit=None, order=None):
+        for name in self._rollups:
+            result = self._rollup_read_group(name, domain, groupby, aggregates, having, offset, limit, order)
+            if result is not None:
+                return result
+        return super()._read_group(domain, groupby, aggregates, having, offset, limit, order)
+
+    def _rollup_read_group(self, name, domain, groupby, aggregates, having, offset, limit, order):
+        """ Answer ``_read_group`` from the rollup, or return ``None`` when the
+        rollup cannot give the exact same result.
+        """
+        if having:
+            return None
+        if name not in getattr(self.pool, '_rollup_tables_checked', ()):
+            self._rollup_create_table(name)
+        rollup = self._rollups[name]
+        specs = {fname: (column, granularity) for column, fname, granularity in self._rollup_specs(name)}
+        tz = rollup.get('tz') or 'UTC'
+        if any(granularity and self._fields[fname].type == 'datetime' for fname, (_c, granularity) in specs.items()):
+            if (self.env.context.get('tz') or 'UTC') != tz:
+                return None
+
+        terms = {}
+        for spec in groupby:
+            fname, _, granularity = spec.partition(':')
+            if fname not in specs:
+                return None
+            column, rollup_granularity = specs[fname]
+            term = SQL.identifier(column)
+            if rollup_granularity:
+                granularity = granularity or 'month'
+                if granularity not in ROLLUP_GRANULARITIES:
+                    return None
+                if ROLLUP_GRANULARITIES.index(granularity) < ROLLUP_GRANULARITIES.index(rollup_granularity):
+                    return None
+                if granularity != rollup_granularity:
+                    term = SQL("date_trunc(%s, %s)::date", granularity, term)
+            elif granularity:
+                return None
+            terms[spec] = term
+        for spec in aggregates:
+            if spec == '__count':
+                terms[spec] = SQL("COALESCE(SUM(count), 0)")
+            elif spec.endswith(':sum') and spec[:-4] in rollup['measures']:
+                terms[spec] = SQL("COALESCE(SUM(%s), 0)", SQL.identifier("%s_sum" % spec[:-4]))
+            else:
+                return None
+
+        # The rollup holds every row: record rules and active_test must be
+        # expressible on its columns too
+        self.check_access_rights('read')
+        domains = [domain, self.env['ir.rule']._compute_domain(self._name, 'read')]
+        if self._active_name and self.env.context.get('active_test', True):
+            domains.append([(self._active_name, '=', True)])
+        # Like core: 'not' applies to the leaves, so that NULL buckets match
+        # the negation of an equality
+        where = self._rollup_where(specs, tz, expression.distribute_not(
+            expression.normalize_domain(expression.AND(domains))
+        ))
+        if where is None:
+            return None
+
+        order_by = []
+        for term in (order or ", ".join(groupby)).split(','):
+            term = term.strip()
+            if not term:
+                continue
+            spec, _, direction = term.partition(' ')
+            direction = direction.strip().upper() or 'ASC'
+            if spec not in terms or direction not in ('ASC', 'DESC'):
+                return None
+            field = self._fields.get(spec.partition(':')[0])
+            if spec in groupby and field.type == 'many2one' \
+                    and self.env[field.comodel_name]._order.strip().lower() not in ('id', 'id asc'):
+                # Core sorts many2one groups by the comodel's _order
+                return None
+            order_by.append(SQL("%s %s", terms[spec], SQL(direction)))
+
+        query = SQL(
+            "SELECT %s FROM %s WHERE %s",
+            SQL(", ").join(terms[spec] for spec in list(groupby) + list(aggregates)),
+            SQL.identifier("rollup_%s" % name),
+            where,
+        )
+        if groupby:
+            query = SQL(
+                "%s GROUP BY %s HAVING SUM(count) > 0",
+                query, SQL(", ").join(terms[spec] for spec in groupby),
+            )
+        if order_by:
+            query = SQL("%s ORDER BY %s", query, SQL(", ").join(order_by))
+        if limit:
+            query = SQL("%s LIMIT %s", query, limit)
+        if offset:
+            query = SQL("%s OFFSET %s", query, offset)
+        # The rollup is updated when the records are flushed: pending writes
+        # and stored measures still to recompute must reach it first
+        self.flush_model(list(specs) + list(rollup['measures']))
+        self.env.cr.execute(query)
+
+        result = []
+        for row in self.env.cr.fetchall():
+            values = []
+            for spec, value in zip(groupby, row):
+                field = self._fields[spec.partition(':')[0]]
+                if field.type == 'many2one':
+                    value = self.env[field.comodel_name].browse(value)
+                elif field.type == 'datetime' and value:
+                    value = datetime.combine(value, datetime.min.time())
+                elif value is None:
+                    value = False
+                values.append(value)
+            result.append(tuple(values) + tuple(row[len(groupby):]))
+        return result
+
+    def _rollup_where(self, specs, tz, domain):
+        """ Translate a normalized domain into a condition on the rollup
+        columns, or return ``None`` if that is not possible.
+        """
+        stack = []
+        for element in reversed(domain):
+            if element == '!':
+                # A negation left by distribute_not(): NOT drops NULL buckets
+                return None
+            if element in ('&', '|'):
+                left, right = stack.pop(), stack.pop()
+                stack.append(SQL("(%s %s %s)", left, SQL('AND' if element == '&' else 'OR'), right))
+            else:
+                condition = self._rollup_leaf(specs, tz, element)
+                if condition is None:
+                    return None
+                stack.append(condition)
+        return stack[0] if stack else SQL("TRUE")
+
+    def _rollup_leaf(self, specs, tz, leaf):
+        if tuple(leaf) == expression.TRUE_LEAF:
+            return SQL("TRUE")
+        if tuple(leaf) == expression.FALSE_LEAF:
+            return SQL("FALSE")
+        fname, operator, value = leaf
+        if fname not in specs:
+            return None
+        column, granularity = specs[fname]
+        identifier = SQL.identifier(column)
+        field = self._fields[fname]
+
+        if granularity:
+            # The bucket column only answers ranges starting on a bucket boundary
+            if operator not in ('>=', '<') or not value:
+                return None
+            if field.type == 'datetime':
+                bound = pytz.utc.localize(fields.Datetime.to_datetime(value)).astimezone(pytz.timezone(tz))
+                if bound.time() != datetime.min.time():
+                    return None
+                bound = bound.date()
+            else:
+                bound = fields.Date.to_date(value)
+            if granularity != 'day' and (bound.day != 1 or (
+                granularity == 'quarter' and bound.month % 3 != 1
+            ) or (granularity == 'year' and bound.month != 1)):
+                return None
+            return SQL("%s %s %s", identifier, SQL(operator), bound)
+
+        if isinstance(value, models.BaseModel):
+            value = value.ids
+        if operator in ('=', '!=') and value is False:
+            return SQL("%s IS %s NULL", identifier, SQL('' if operator == '=' else 'NOT'))
+        if operator in ('in', 'not in') and isinstance(value, (list, tuple)):
+            if False in value:
+                return None
+            if not value:
+                return SQL("FALSE" if operator == 'in' else "TRUE")
+            if operator == 'in':
+                return SQL("%s IN %s", identifier, tuple(value))
+            return SQL("(%s NOT IN %s OR %s IS NULL)", identifier, tuple(value), identifier)
+        if operator == '=':
+            return SQL("%s = %s", identifier, value)
+        if operator == '!=':
+            return SQL("(%s != %s OR %s IS NULL)", identifier, value, identifier)
+        return None
+
+
+# ============================================
+# SEARCH RESULT CACHE
+# ============================================
+# key -> (result, dependencies), least recently used first
+_search_cache = collections.OrderedDict()
+# (dbname, model, fname or None) -> keys; None collects every key using the model
+_search_cache_index = collections.defaultdict(set)
+# (dbname, model, fname or None) -> highest txid of a committed invalidation
+_search_cache_invalidated = {}
+_search_cache_lock = threading.RLock()
+_search_cache_listener = []
+
+
+def _search_cache_drop(dbname, dependencies):
+    """ Drop the entries depending on ``dependencies``, a list of
+    ``(model, fname)`` where ``fname=None`` stands for the whole model.
+    """
+    with _search_cache_lock:
+        for model_name, fname in dependencies:
+            for key in _search_cache_index.pop((dbname, model_name, fname), ()):
+                entry = _search_cache.pop(key, None)
+                if entry is not None:
+                    for dependency in entry[1]:
+                        _search_cache_index[(dbname, *dependency)].discard(key)
+
+
+def _search_cache_listen():
+    """ Start the thread receiving the invalidations of the other workers. """
+    with _search_cache_lock:
+        if _search_cache_listener:
+            return
+        _search_cache_listener.append(threading.Thread(
+            target=_search_cache_loop, name='odoo.search_cache', daemon=True,
+        ))
+    _search_cache_listener[0].start()
+
+
+def _search_cache_loop():
+    while True:
+        try:
+            with sql_db.db_connect('postgres').cursor() as cr:
+                conn = cr._cnx
+                cr.execute("LISTEN search_cache")
+                cr.commit()
+                # Notifications may have been missed while disconnected
+                with _search_cache_lock:
+                    _search_cache.clear()
+                    _search_cache_index.clear()
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        payload = json.loads(conn.notifies.pop().payload)
+                        dependencies = [tuple(dependency) for dependency in payload['dependencies']]
+                        with _search_cache_lock:
+                            for dependency in dependencies:
+                                key = (payload['dbname'], *dependency)
+                                _search_cache_invalidated[key] = max(
+                                    _search_cache_invalidated.get(key, 0), payload['txid'],
+                                )
+                        _search_cache_drop(payload['dbname'], dependencies)
+        except Exception:
+            _logger.exception("Search cache listener failed, restarting in 10 seconds")
+            time.sleep(10)
+
+
+class BaseSearchCache(models.AbstractModel):
+    _inherit = 'base'
+
+    # Cache every search()/search_count() of the model, not only the ones
+    # called with search_cache=True in the context
+    _search_cache = False
+
+    def _search_cache_enabled(self):
+        return int(config.get('search_cache_size') or 0) > 0 and (
+            self._search_cache or self.env.context.get('search_cache')
+        )
+
+    def _search_cache_key(self, domain, *args):
+        context = self.env.context
+        # The record rules as they are now (cached by ir.rule, and reset when
+        # the rules or the user's groups change): a new rule gives a new key
+        rules = None if self.env.su else repr(self.env['ir.rule']._compute_domain(self._name, 'read'))
+        return (
+            self.env.cr.dbname, self._name, repr(expression.normalize_domain(domain)), args,
+            self.env.uid, self.env.su, tuple(self.env.companies.ids),
+            context.get('active_test', True), context.get('lang'), rules,
+        )
+
+    def _search_cache_dependencies(self, domain, order):
+        """ Return the ``(model, fname)`` the result of the search depends on,
+        or ``None`` if they cannot be known.
+        """
+        dependencies = set()
+
+        def add_path(model, path):
+            """ Add the fields of ``path``, return the model it ends on. """
+            for fname in path.split('.'):
+                field = model._fields.get(fname)
+                if field is None:
+                    return None
+                if field.related:
+                    # Follow the related path, then go on from where it ends
+                    if field.store:
+                        dependencies.add((model._name, fname))
+                    model = add_path(model, field.related)
+                    if model is None:
+                        return None
+                    continue
+                if not field.store:
+                    return None
+                dependencies.add((model._name, fname))
+                if field.type == 'one2many':
+                    dependencies.add((field.comodel_name, field.inverse_name))
+                if field.relational:
+                    model = self.env[field.comodel_name]
+            return model
+
+        domains = [domain]
+        if self._active_name and self.env.context.get('active_test', True):
+            domains.append([(self._active_name, '=', True)])
+        if not self.env.su:
+            domains.append(self.env['ir.rule']._compute_domain(self._name, 'read'))
+        for leaf in expression.AND(domains):
+            if not isinstance(leaf, (list, tuple)) or tuple(leaf) in (expression.TRUE_LEAF, expression.FALSE_LEAF):
+                continue
+            model = add_path(self, str(leaf[0]))
+            if model is None:
+                return None
+            if leaf[1] in ('child_of', 'parent_of') and model._parent_name in model._fields:
+                dependencies.add((model._name, model._parent_name))
+        for term in (order or self._order).split(','):
+            if not term.strip():
+                continue
+            fname = term.split()[0].strip('"')
+            if add_path(self, fname) is None:
+                return None
+            field = self._fields[fname]
+            if field.type == 'many2one':
+                # Ordering by a many2one sorts on the comodel's _order
+                comodel = self.env[field.comodel_name]
+                for comodel_term in comodel._order.split(','):
+                    if comodel_term.strip() and add_path(comodel, comodel_term.split()[0].strip('"')) is None:
+                        return None
+        dependencies.update({(model_name, None) for model_name, _fname in list(dependencies)})
+        dependencies.add((self._name, None))
+        return dependencies
+
+    def _search_cache_get(self, key, dependencies):
+        """ Return the cached result, or ``None`` with a function to store it. """
+        dirty = self.env.cr.precommit.data.get('search.cache.dirty', set())
+        if dependencies is None or not dependencies.isdisjoint(dirty):
+            # Our own uncommitted changes must not leak to other transactions
+            return None, lambda result: None
+        _search_cache_listen()
+        with _search_cache_lock:
+            entry = _search_cache.get(key)
+            if entry is not None:
+                _search_cache.move_to_end(key)
+                return entry[0], None
+
+        dbname = self.env.cr.dbname
+        # An older transaction may still see what was there before the last
+        # change: it must not store its result. Every transaction committed
+        # before the snapshot's xmin is visible to it (database clock only)
+        data = self.env.cr.precommit.data
+        if 'search.cache.xmin' not in data:
+            self.env.cr.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            data['search.cache.xmin'] = self.env.cr.fetchone()[0]
+        xmin = data['search.cache.xmin']
+
+        def store(result):
+            with _search_cache_lock:
+                if any(
+                    _search_cache_invalidated.get((dbname, *dependency), 0) >= xmin
+                    for dependency in dependencies
+                ):
+                    return
+                _search_cache[key] = (result, dependencies)
+                for dependency in dependencies:
+                    _search_cache_index[(dbname, *dependency)].add(key)
+                while len(_search_cache) > int(config.get('search_cache_size')):
+                    old_key, (_result, old_dependencies) = _search_cache.popitem(last=False)
+                    for dependency in old_dependencies:
+                        _search_cache_index[(old_key[0], *dependency)].discard(old_key)
+
+        return None, store
+
+    def search_fetch(self, domain, field_names, offset=0, limit=None, order=None):
+        if not self._search_cache_enabled():
+            return super().search_fetch(domain, field_names, offset=offset, limit=limit, order=order)
+        key = self._search_cache_key(domain, 'search', order, limit, offset)
+        ids, store = self._search_cache_get(key, self._search_cache_dependencies(domain, order))
+        if ids is not None:
+            records = self.browse(ids)
+            if field_names:
+                records.fetch(field_names)
+            return records
+        records = super().search_fetch(domain, field_names, offset=offset, limit=limit, order=order)
+        store(tuple(records._ids))
+        return records
+
+    @api.model
+    def search_count(self, domain, limit=None):
+        if not self._search_cache_enabled():
+            return super().search_count(domain, limit=limit)
+        key = self._search_cache_key(domain, 'count', limit)
+        count, store = self._search_cache_get(key, self._search_cache_dependencies(domain, None))
+        if count is not None:
+            return count
+        count = super().search_count(domain, limit=limit)
+        store(count)
+        return count
+
+    # --------------------------------------------
+    # Invalidation
+    # --------------------------------------------
+    def _search_cache_invalidate(self, fnames=None):
+        """ Invalidate the searches depending on ``fnames`` of the model (the
+        whole model if ``None``) in this worker now, and in every worker once
+        the transaction is committed.
+        """
+        if not int(config.get('search_cache_size') or 0):
+            return
+        dependencies = {(self._name, None)} if fnames is None else {(self._name, fname) for fname in fnames}
+        _search_cache_drop(self.env.cr.dbname, dependencies)
+        data = self.env.cr.precommit.data
+        if 'search.cache.dirty' not in data:
+            data['search.cache.dirty'] = dirty = set()
+            dbname = self.env.cr.dbname
+            self.env.cr.execute("SELECT txid_current()")
+            txid = self.env.cr.fetchone()[0]
+
+            def notify():
+                payload = json.dumps({'dbname': dbname, 'txid': txid, 'dependencies': sorted(dirty, key=str)})
+                if len(payload) > 7900:
+                    # NOTIFY payloads are limited to 8000 bytes: drop whole models
+                    payload = json.dumps({'dbname': dbname, 'txid': txid, 'dependencies': sorted(
+                        {(model_name, None) for model_name, _fname in dirty}
+                    )})
+                with sql_db.db_connect('postgres').cursor() as cr:
+                    cr.execute("SELECT pg_notify('search_cache', %s)", [payload])
+
+            self.env.cr.postcommit.add(notify)
+        data['search.cache.dirty'].update(dependencies)
+
+    @api.model
+    def _create(self, data_list):
+        records = super()._create(data_list)
+        self._search_cache_invalidate()
+        return records
+
+    def write(self, vals):
+        # x2many fields are written without going through _write()
+        self._search_cache_invalidate(list(vals))
+        return super().write(vals)
+
+    def _write(self, vals):
+        self._search_cache_invalidate(list(vals))
+        return super()._write(vals)
+
+    def unlink(self):
+        self._search_cache_invalidate()
+        return super().unlink()
+
+
+# ============================================
+# LAZY SEARCH
+# ============================================
+class LazySearch:
+    """ Unevaluated ``search()``: the chained calls refine a single query,
+    which runs on first iteration, ``len()`` or ``bool()``.
+    """
+
+    def __init__(self, model, domain, order=None, limit=None, field_name=None):
+        self._model = model
+        self._domain = list(domain)
+        self._order = order
+        self._limit = limit
+        self._field_name = field_name
+        self._result = None
+
+    def _copy(self, **kwargs):
+        values = dict(domain=self._domain, order=self._order, limit=self._limit, field_name=self._field_name)
+        values.update(kwargs)
+        return LazySearch(self._model, **values)
+
+    def __repr__(self):
+        return "LazySearch(%s, %r, order=%r, limit=%r, field=%r)" % (
+            self._model._name, self._domain, self._order, self._limit, self._field_name,
+        )
+
+    # --------------------------------------------
+    # Folded into the query
+    # --------------------------------------------
+    def filtered_domain(self, domain):
+        if self._field_name or self._limit is not None:
+            return self._records().filtered_domain(domain)
+        return self._copy(domain=expression.AND([self._domain, domain]))
+
+    def sorted(self, key=None, reverse=False):
+        if callable(key) or self._field_name or self._limit is not None:
+            return self._records().sorted(key, reverse=reverse)
+        order = key or self._model._order
+        if reverse:
+            terms = []
+            for term in order.split(','):
+                fname, _, direction = term.strip().partition(' ')
+                terms.append("%s %s" % (fname, 'ASC' if direction.strip().upper() == 'DESC' else 'DESC'))
+            order = ", ".join(terms)
+        return self._copy(order=order)
+
+    def limit(self, limit):
+        return self._copy(limit=limit if self._limit is None else min(limit, self._limit))
+
+    def mapped(self, func):
+        field = self._model._fields.get(func) if isinstance(func, str) else None
+        if self._field_name or field is None or not field.store or not field.column_type:
+            return self._records().mapped(func)
+        return self._copy(field_name=func)
+
+    def filtered(self, func):
+        return self._records().filtered(func)
+
+    def exists(self):
+        """ Return whether the query matches anything (``LIMIT 1``). """
+        if self._result is not None:
+            return bool(self._result)
+        return bool(self._model.search(self._domain, limit=1))
+
+    # --------------------------------------------
+    # Evaluation
+    # --------------------------------------------
+    def _records(self):
+        if self._field_name:
+            return self._model.search(self._domain, order=self._order, limit=self._limit).mapped(self._field_name)
+        return self._evaluate()
+
+    def _evaluate(self):
+        if self._result is not None:
+            return self._result
+        model = self._model
+        if not self._field_name:
+            self._result = model.search(self._domain, order=self._order, limit=self._limit)
+            return self._result
+
+        # SELECT <field> FROM ... WHERE ... ORDER BY ... LIMIT ...
+        model.check_access_rights('read')
+        model.check_field_access_rights('read', [self._field_name])
+        field = model._fields[self._field_name]
+        query = model._search(self._domain, order=self._order, limit=self._limit)
+        # execute_query() flushes every field of the query first: the mapped
+        # field, and the fields of the domain and of the order
+        rows = model.env.execute_query(query.select(model._field_to_sql(model._table, self._field_name, query)))
+        values = [value for value, in rows]
+        if field.type == 'many2one':
+            # Like recordset.mapped(): a recordset without duplicates
+            self._result = model.env[field.comodel_name].browse(dict.fromkeys(filter(None, values)))
+        else:
+            self._result = [
+                field.convert_to_record(field.convert_to_cache(value, model, validate=False), model)
+                for value in values
+            ]
+        return self._result
+
+    def __iter__(self):
+        return iter(self._evaluate())
+
+    def __len__(self):
+        return len(self._evaluate())
+
+    def __bool__(self):
+        return bool(self._evaluate())
+
+    def __getitem__(self, index):
+        return self._evaluate()[index]
+
+
+class BaseLazySearch(models.AbstractModel):
+    _inherit = 'base'
+
+    @api.model
+    def search_lazy(self, domain=None):
+        """ Return an unevaluated search for ``domain``, see ``LazySearch``. """
+        return LazySearch(self, domain or [])
+
+
+# ============================================
+# TRIGRAM INDEXES FOR LIKE/ILIKE
+# ============================================
+class BaseTrigramSearch(models.AbstractModel):
+    _inherit = 'base'
+
+    def _condition_to_sql(self, alias, fname, operator, value, query):
+        condition = super()._condition_to_sql(alias, fname, operator, value, query)
+        field = self._fields.get(fname)
+        if (
+            field is None or operator not in ('=like', '=ilike') or not isinstance(value, str)
+            or field.index != 'trigram' or not field.store or not field.translate
+            # the pattern must read the same inside the json text of the index
+            or json.dumps(value, ensure_ascii=False)[1:-1] != value
+        ):
+            return condition
+        # Odoo adds a condition on its index expression for like/ilike only:
+        # =like/=ilike get it too. Any translation matching the pattern
+        # contains it, ``condition`` then checks the user's language.
+        unaccent = self.env.registry.unaccent
+        indexed = SQL("jsonb_path_query_array(%s, '$.*')::text", SQL.identifier(alias, fname))
+        return SQL(
+            "(%s AND %s %s %s)",
+            condition,
+            unaccent(indexed),
+            SQL('LIKE' if operator == '=like' else 'ILIKE'),
+            unaccent(SQL("%s", '%%%s%%' % value)),
+        )
@@ -2,9 +2,35 @@
 # ODOO ORM WRITE - COMPLETE GUIDE
 # ============================================
 
+import collections
+import contextlib
+import functools
+import hashlib
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+from psycopg2.extras import Json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import odoo
 from odoo import models, fields, api
+from odoo.modules.registry import Registry
+from odoo.tools import SQL
+from odoo.tools.safe_eval import safe_eval
+from odoo.exceptions import AccessError, MissingError, UserError, ValidationError
 from datetime import date, datetime, timedelta
 
+_logger = logging.getLogger(__name__)
+
 class WriteExamples(models.Model):
     _name = 'write.examples'
     _description = 'Write Examples'
@@ -574,6 +600,242 @@ class WriteExamples(models.Model):
         record = self.env['write.examples'].browse(1)
         record.write({'name': 'test'})  # Will be saved as 'TEST'
 
+    # ============================================
+    # 21. UPSERT (INSERT ... ON CONFLICT)
+    # ============================================
+    def upsert_records(self):
+        rows = [
+            {'email': 'john@example.com', 'name': 'John'},
+            {'email': 'jane@example.com', 'name': 'Jane'},
+        ]
+
+        # ❌ BAD - Search then write/create per row
+        # 2 round trips per row, and two workers can both create the same email
+        for vals in rows:
+            partner = self.env['res.partner'].search([('email', '=', vals['email'])], limit=1)
+            if partner:
+                partner.write(vals)
+            else:
+                self.env['res.partner'].create(vals)
+
+        # ✅ GOOD - One INSERT ... ON CONFLICT DO UPDATE per batch
+        partners = self.env['res.partner'].upsert(rows, conflict_fields=['email'])
+        # Returns the records in input order (duplicated keys give the same record)
+        # Defaults are applied to inserted rows only
+        # Computed fields and @api.constrains run for inserted AND updated rows;
+        # a stored computed field given in the values keeps that value
+        # Field access (groups=) is checked like create() and write()
+        # Record rules: 'write' on the existing rows before they are updated,
+        # 'create' on the inserted rows
+        # parent_path is maintained (res.partner is a _parent_store model)
+        # Translated fields: the user's language is set, the others are kept
+
+        # The conflict fields need a UNIQUE index (or unique constraint):
+        # CREATE UNIQUE INDEX res_partner_email_uniq ON res_partner (email);
+        # Only stored, non-x2many fields can be upserted
+
+    # ============================================
+    # 22. BATCHED MAIL TRACKING
+    # ============================================
+    def batched_tracking(self):
+        partners = self.env['res.partner'].search([('customer', '=', True)])
+
+        # ❌ BAD - Disabling tracking just to make the write fast
+        partners.with_context(tracking_disable=True).write({'user_id': 2})
+        # The chatter loses the history of the change
+
+        # ✅ GOOD - Keep tracking, but batch it
+        partners.with_context(tracking_batch=True).write({'user_id': 2})
+        # Old values are read in bulk before the write
+        # Messages and tracking values are created with multi-row INSERTs at commit
+
+        # Changes with a tracking subtype (_track_subtype) still go through
+        # message_post() and notify the followers; _track_template is sent too
+
+        # ✅ GOOD - Hand tracking off to a queue
+        partners.with_context(tracking_batch='postcommit').write({'user_id': 2})
+        # The write returns without waiting on the chatter
+        # Tracking is computed at commit and queued in the same transaction
+        # (never lost), then stored by a cron triggered right away
+
+    # ============================================
+    # 23. SET-BASED ONE2MANY COMMANDS
+    # ============================================
+    def batched_one2many_commands(self):
+        orders = self.env['sale.order'].search([('state', '=', 'draft')])
+        commands = [
+            (0, 0, {'product_id': 10, 'product_uom_qty': 1}),  # Add new
+            (0, 0, {'product_id': 11, 'product_uom_qty': 1}),  # Add new
+            (1, 5, {'discount': 10.0}),                        # Update line 5
+            (1, 6, {'discount': 10.0}),                        # Update line 6
+            (2, 7, 0),                                         # Delete line 7
+            (2, 8, 0),                                         # Delete line 8
+        ]
+
+        # ❌ SLOW - Every command is its own create/write/unlink
+        orders.write({'order_line': commands})
+
+        # ✅ FAST - Consecutive commands of the same kind run as one operation
+        orders.with_context(one2many_batch=True).write({'order_line': commands})
+        # - all (0, 0, vals): ONE create() = one multi-row INSERT,
+        #   for every order of the recordset at once
+        # - (1, id, vals): ONE write() per distinct vals
+        # - (2, id, 0) / (5, 0, 0): ONE unlink()
+        # - (3, id, 0) / (4, id, 0): ONE write() of the inverse field (order_id)
+        # Computed fields (amount_total) are recomputed once, at flush
+        # Commands keep their order: [(5, 0, 0), (0, 0, vals)] still clears first
+        # ⚠️ The orders' write() never sees 'order_line': overrides of
+        # sale.order.write() reacting to it are skipped, the lines' own
+        # create()/write()/unlink() overrides still run
+
+    # ============================================
+    # 24. DIFF-BASED MANY2MANY WRITES
+    # ============================================
+    def diff_many2many(self):
+        partners = self.env['res.partner'].search([('customer', '=', True)])
+
+        # ❌ SLOW - (6, 0, ids) deletes and re-inserts every relation row,
+        # even for the partners that already have exactly these tags
+        partners.write({'category_id': [(6, 0, [1, 2, 3])]})
+
+        # ✅ FAST - Compare with the current rows, write only the differences
+        partners.with_context(many2many_diff=True).write({'category_id': [(6, 0, [1, 2, 3])]})
+        # - ONE DELETE for all removed (partner, tag) pairs of the recordset
+        # - ONE INSERT for all added pairs
+        # - Partners whose tags did not change: no recompute, no write_date,
+        #   no constraint check (and tracking finds nothing to log)
+        # - Partners whose tags changed go through write() with category_id
+        #   as usual, after the DELETE/INSERT: it finds nothing left to write
+        # - Write access rights, record rules and field groups are checked
+        #   on ALL partners
+        # Works with every command: (4, id), (3, id), (5,), (6, 0, ids), ...
+
+    # ============================================
+    # 25. BULK WRITE/CREATE WITH PER-ROW ERRORS
+    # ============================================
+    def bulk_with_error_isolation(self):
+        rows = [
+            {'id': 1, 'email': 'john@example.com'},
+            {'id': 2, 'email': 'invalid-email'},     # ValidationError
+            {'id': 9999, 'email': 'ghost@example.com'},  # MissingError
+        ]
+
+        # ❌ SLOW - One try/except (= one savepoint) per record
+        for vals in rows:
+            try:
+                with self.env.cr.savepoint():
+                    self.env['res.partner'].browse(vals['id']).write({'email': vals['email']})
+            except (ValidationError, MissingError, AccessError) as e:
+                print(f"Row {vals['id']} failed: {e}")
+
+        # ✅ FAST - Try the whole batch, bisect only when something fails
+        partners, errors = self.env['res.partner'].write_many(rows, on_error='collect')
+        for error in errors:
+            print(error['index'], error['id'], error['type'], error['message'])
+        # [{'index': 1, 'id': 2, 'type': 'ValidationError', 'message': '...', ...}, ...]
+
+        # Same for create (imports)
+        partners, errors = self.env['res.partner'].create_many([
+            {'name': 'John', 'email': 'john@example.com'},
+            {'name': 'Jane', 'email': 'invalid-email'},
+        ], on_error='collect')
+
+        # k bad rows out of n cost about k * log2(n) savepoints instead of n
+        # Rows with the same values are written together (one UPDATE)
+        # on_error='raise' (default) behaves like write()/create(): all or nothing
+
+    # ============================================
+    # 26. PARALLEL, RESUMABLE BATCH PROCESSING
+    # ============================================
+    def parallel_batch_processing(self):
+        # ❌ SLOW - One core, one huge transaction that blocks other users
+        partners = self.env['res.partner'].search([])
+        for partner in partners:
+            if not partner.website:
+                partner.website = f"https://www.{partner.name.lower().replace(' ', '')}.com"
+
+        # ✅ FAST - Chunks processed by a pool of processes, committed one by one
+        # (server-side only: _batch_process() cannot be called over RPC)
+        result = self.env['res.partner']._batch_process(
+            [('website', '=', False)],
+            'generate_website',     # method called on each chunk (a recordset)
+            chunk_size=1000,
+            workers=4,
+        )
+        print(result)  # {'run': 7, 'total': 120, 'done': 120, 'failed': 0}
+        # A module-level function func(records) works too (must be importable)
+        # Private names (starting with _) are refused
+
+        # - Every worker has its own registry and cursor, and commits each chunk
+        # - Chunks are claimed with SELECT ... FOR UPDATE SKIP LOCKED: several
+        #   runners (other servers, cron) can share the same run safely
+        # - Progress is saved per chunk: calling _batch_process() again with the
+        #   same arguments resumes the last UNFINISHED run where it stopped,
+        #   and retries the chunks that failed; once a run is finished, the
+        #   same call starts a new run (daily jobs). name= resumes that run.
+        # - Each chunk is its own transaction: write func so it can be re-run
+        # - func runs as the caller (same user, context and sudo); the runs
+        #   and chunks themselves are only read and written as superuser
+        # - The ids are computed once, from committed data, when the run starts
+
+    # ============================================
+    # 27. VECTORIZED COMPUTE (STORED COMPUTED FIELDS)
+    # ============================================
+    def vectorized_compute(self):
+        # amount_total depends on the lines: price_unit * product_uom_qty * (1 - discount / 100)
+
+        # ❌ SLOW - Classic compute: Python loop over orders, then over lines
+        # @api.depends('order_line.price_unit', 'order_line.product_uom_qty', 'order_line.discount')
+        # def _compute_amount_total(self):
+        #     for order in self:
+        #         order.amount_total = sum(
+        #             line.price_unit * line.product_uom_qty * (1 - line.discount / 100)
+        #             for line in order.order_line
+        #         )
+
+        # ✅ FAST - Vectorized compute: whole columns in, whole columns out
+        # @api.depends('order_line.price_unit', 'order_line.product_uom_qty', 'order_line.discount')
+        # @vectorized(lines=('order_line', ['price_unit', 'product_uom_qty', 'discount']))
+        # def _compute_amount_total(self, batch):
+        #     lines = batch.lines['lines']
+        #     subtotal = lines['price_unit'] * lines['product_uom_qty'] * (1 - lines['discount'] / 100)
+        #     return {'amount_total': lines.sum(subtotal)}    # one value per order
+
+        # - batch['field']: numpy array of a field of the records being computed
+        # - batch.lines[name]: the lines of a one2many, with lines.sum(),
+        #   lines.count(), lines.min(), lines.max() reduced per parent record,
+        #   filtered by the domain of the one2many (a string domain that needs
+        #   the record's values is refused: give it as a list)
+        # - Return {field: array}, in the order of the records
+        # - The columns are read with one SELECT per table for the whole batch
+        #   (100k orders = a few array passes instead of 100k Python loops)
+        # - Needs numpy; new records (onchange) are read from the cache instead
+        self.env['sale.order'].search([])._recompute_recordset(['amount_total'])
+
+    # ============================================
+    # 28. SKIP NO-OP WRITES
+    # ============================================
+    def skip_noop_writes(self):
+        # ❌ WASTEFUL - Most partners are already active: every one of them
+        # still gets an UPDATE, a write_date bump, recomputes and tracking
+        partners = self.env['res.partner'].search([('customer', '=', True)])
+        partners.write({'active': True})
+
+        # ✅ GOOD - Write only the records and fields that actually change
+        report = partners.write_changes({'active': True, 'user_id': 2})
+        print(report)
+        # {'written_records': 12, 'skipped_records': 4988, 'skipped_fields': 9980}
+
+        # - Current values come from the cache, or one SELECT per 1000 records
+        # - New values are converted like write() does: floats rounded to
+        #   their digits, amounts to the currency of each record
+        # - Records are grouped by the set of fields that change: one write() each,
+        #   through the whole chain of write() overrides (tracking included)
+        # - Access rights and record rules are still checked on ALL the records
+        # - x2many and non-stored fields are never compared: always written
+        # - Skipped records don't run write() at all: overrides of write()
+        #   with side effects won't see them (that is the point, but check)
+
 
 # ============================================
 # RELATED MODEL FOR EXAMPLES
@@ -589,4 +851,1084 @@ class WriteLine(models.Model):
 class WriteTag(models.Model):
     _name = 'write.tag'
     
-    name = fields.Char()
\ No newline at end of file
+    name = fields.Char()
+
+
+# ============================================
+# ORM EXTENSIONS (available on every model)
+# ============================================
+# Errors write_many()/create_many() report per row with on_error='collect'
+COLLECTED_ERRORS = (
+    UserError,          # includes ValidationError
+    AccessError,
+    MissingError,
+    ValueError,         # wrong value for a field
+    psycopg2.IntegrityError,    # SQL constraints
+)
+
+
+def _x2many_commands(value):
+    """ Return the x2many ``value`` of a write() as a list of commands, the
+    way the ORM reads it: a recordset or a list of ids replaces the lines,
+    ``False`` removes them all.
+    """
+    if isinstance(value, tuple):
+        return [value]
+    if isinstance(value, models.BaseModel):
+        return [(6, 0, value.ids)]
+    if value is False or value is None:
+        return [(5, 0, 0)]
+    if isinstance(value, list) and value and not isinstance(value[0], (tuple, list)):
+        return [(6, 0, list(value))]
+    if not isinstance(value, list):
+        raise ValueError("Wrong value for an x2many field: %r" % (value,))
+    return value
+
+
+class BaseWriteExtensions(models.AbstractModel):
+    _inherit = 'base'
+
+    def write(self, vals):
+        context = self.env.context
+        if not (context.get('one2many_batch') or context.get('many2many_diff')):
+            return super().write(vals)
+        vals = dict(vals)
+        one2many, many2many = {}, {}
+        for fname in list(vals):
+            field = self._fields.get(fname)
+            if field is None:
+                continue
+            if context.get('one2many_batch') and field.type == 'one2many' and field.inverse_name \
+                    and self.env[field.comodel_name]._fields[field.inverse_name].type == 'many2one':
+                one2many[fname] = _x2many_commands(vals.pop(fname))
+            elif context.get('many2many_diff') and field.type == 'many2many' and field.store:
+                many2many[fname] = _x2many_commands(vals.pop(fname))
+        # The records themselves go through write() as usual (access rights
+        # and rules, write_date), even with one2many values only; with
+        # many2many values only, just the records whose set changes do, see
+        # _write_many2many_diff()
+        result = super().write(vals) if vals or one2many or not many2many else True
+        for fname, commands in one2many.items():
+            self._write_one2many_batched(fname, commands)
+        if one2many:
+            # @api.constrains('order_line') and the like
+            self._validate_fields(list(one2many))
+        for fname, commands in many2many.items():
+            self._write_many2many_diff(fname, commands)
+        return result
+
+    def write_changes(self, vals):
+        """ Write ``vals`` only on the records and fields whose value changes.
+
+        :return: dict with the number of ``written_records``,
+            ``skipped_records`` (nothing to write) and ``skipped_fields``
+            (record/field pairs left untouched)
+        """
+        self.check_access_rights('write')
+        self.check_access_rule('write')
+        comparable = [
+            fname for fname in vals
+            if fname in self._fields and self._fields[fname].store and self._fields[fname].column_type
+            # an amount in a currency that changes too is always written
+            and getattr(self._fields[fname], 'currency_field', None) not in vals
+        ]
+        always = {fname: value for fname, value in vals.items() if fname not in comparable}
+
+        def convert(fname, records):
+            # Same conversion as write(): floats rounded to their digits,
+            # amounts to the currency of the record
+            field = self._fields[fname]
+            return field.convert_to_record(field.convert_to_cache(vals[fname], records), records)
+
+        # Amounts are converted per record (each has its currency), the other
+        # fields once for all the records
+        per_record = [fname for fname in comparable if self._fields[fname].type == 'monetary']
+        new_values = {fname: convert(fname, self) for fname in comparable if fname not in per_record}
+
+        # Reading record[fname] prefetches the whole recordset at once
+        groups = collections.defaultdict(list)
+        for record in self:
+            changed = tuple(
+                fname for fname in comparable
+                if record[fname] != (convert(fname, record) if fname in per_record else new_values[fname])
+            )
+            groups[changed].append(record.id)
+
+        report = {'written_records': 0, 'skipped_records': 0, 'skipped_fields': 0}
+        for changed, ids in groups.items():
+            report['skipped_fields'] += (len(comparable) - len(changed)) * len(ids)
+            group_vals = dict(always, **{fname: vals[fname] for fname in changed})
+            if not group_vals:
+                report['skipped_records'] += len(ids)
+                continue
+            self.browse(ids).write(group_vals)
+            report['written_records'] += len(ids)
+        _logger.debug("write_changes() on %s: %s", self._name, report)
+        return report
+
+    def _write_one2many_batched(self, fname, commands):
+        """ Apply ``commands`` to the one2many ``fname`` of every record in
+        ``self``, with one ORM call per run of consecutive same-type commands.
+        """
+        field = self._fields[fname]
+        comodel = self.env[field.comodel_name].with_context(**field.context)
+        inverse = comodel._fields[field.inverse_name]
+
+        def drop(lines):
+            # Same rule as the ORM: lines that cannot live without a parent are deleted
+            if inverse.ondelete == 'cascade' or inverse.required:
+                lines.unlink()
+            else:
+                lines.write({inverse.name: False})
+
+        for code, group in itertools.groupby(commands, key=lambda command: command[0]):
+            group = list(group)
+            if code == 0:
+                comodel.create([
+                    dict(command[2], **{inverse.name: record.id})
+                    for record in self
+                    for command in group
+                ])
+            elif code == 1:
+                ids = [command[1] for command in group]
+                if len(set(ids)) < len(ids):
+                    # The same line is updated twice: keep the order
+                    for command in group:
+                        comodel.browse(command[1]).write(command[2])
+                    continue
+                by_vals = {}
+                for command in group:
+                    by_vals.setdefault(repr(sorted(command[2].items())), (command[2], []))[1].append(command[1])
+                for line_vals, line_ids in by_vals.values():
+                    comodel.browse(line_ids).write(line_vals)
+            elif code == 2:
+                comodel.browse([command[1] for command in group]).unlink()
+            elif code == 3:
+                drop(comodel.browse([command[1] for command in group]))
+            elif code == 4:
+                # A line has a single parent: like write(), the last record wins
+                comodel.browse([command[1] for command in group]).write({inverse.name: self[-1:].id})
+            elif code == 5:
+                drop(self[fname])
+            elif code == 6:
+                line_ids = group[-1][2]
+                drop(self[fname].filtered(lambda line: line.id not in line_ids))
+                # Like the ORM: every given line ends on the last record, even
+                # the lines of the other records of self
+                last = self[-1:]
+                comodel.browse(line_ids).filtered(lambda line: line[inverse.name] != last).write({inverse.name: last.id})
+            else:
+                raise ValueError("Unknown one2many command %r" % (group[0],))
+        return True
+
+    def _write_many2many_diff(self, fname, commands):
+        """ Apply ``commands`` to the many2many ``fname`` of every record in
+        ``self`` by inserting and deleting only the relation rows that change.
+        """
+        if not self:
+            return True
+        # The relation table is written directly: check what write() would
+        self.check_access_rights('write')
+        self.check_access_rule('write')
+        self.check_field_access_rights('write', [fname])
+        field = self._fields[fname]
+        comodel = self.env[field.comodel_name].with_context(**field.context)
+        cr = self.env.cr
+        self.flush_recordset([fname])
+        cr.execute('SELECT "{1}", "{2}" FROM "{0}" WHERE "{1}" IN %s'.format(
+            field.relation, field.column1, field.column2,
+        ), [tuple(self.ids)])
+        current = {record_id: set() for record_id in self.ids}
+        for record_id, line_id in cr.fetchall():
+            current[record_id].add(line_id)
+
+        # Replay the commands on a copy of the current sets; ``applied`` are
+        # the same commands once the lines are created, updated or deleted
+        created = iter(comodel.create([command[2] for command in commands if command[0] == 0]).ids)
+        target = {record_id: set(line_ids) for record_id, line_ids in current.items()}
+        applied = []
+        for command in commands:
+            code = command[0]
+            if code == 1:
+                comodel.browse(command[1]).write(command[2])
+                continue
+            if code == 2:
+                comodel.browse(command[1]).unlink()
+                applied.append((3, command[1]))
+            elif code == 0:
+                line_id = next(created)
+                applied.append((4, line_id))
+            else:
+                applied.append(command)
+            for line_ids in target.values():
+                if code in (0, 4):
+                    line_ids.add(line_id if code == 0 else command[1])
+                elif code in (2, 3):
+                    line_ids.discard(command[1])
+                elif code == 5:
+                    line_ids.clear()
+                elif code == 6:
+                    line_ids.clear()
+                    line_ids.update(command[2])
+                elif code != 1:
+                    raise ValueError("Unknown many2many command %r" % (command,))
+
+        to_delete = [(rid, line_id) for rid in current for line_id in current[rid] - target[rid]]
+        to_insert = [(rid, line_id) for rid in target for line_id in target[rid] - current[rid]]
+        changed = self.browse(sorted({rid for rid, _line_id in to_delete + to_insert}))
+        if not changed:
+            return True
+        # The inverse many2many (tag.partner_ids) of the lines changes too
+        lines = comodel.browse(sorted({line_id for _rid, line_id in to_delete + to_insert}))
+        inverses = [
+            inverse.name for inverse in comodel._fields.values()
+            if inverse.type == 'many2many' and inverse.store and inverse.relation == field.relation
+            and inverse.column1 == field.column2 and inverse.column2 == field.column1
+        ]
+
+        changed.modified([fname], before=True)
+        if inverses:
+            lines.modified(inverses, before=True)
+        if to_delete:
+            cr.execute('DELETE FROM "{0}" WHERE ("{1}", "{2}") IN %s'.format(
+                field.relation, field.column1, field.column2,
+            ), [tuple(to_delete)])
+        if to_insert:
+            cr.execute('INSERT INTO "{0}" ("{1}", "{2}") VALUES {3} ON CONFLICT DO NOTHING'.format(
+                field.relation, field.column1, field.column2, ", ".join(["%s"] * len(to_insert)),
+            ), to_insert)
+        changed.invalidate_recordset([fname])
+        if inverses:
+            lines.invalidate_recordset(inverses)
+            lines.modified(inverses)
+        # The records whose set changed go through write() with the field:
+        # write_date, recomputes, constraints, check_company and tracking as
+        # usual. The relation rows already match: it has nothing to insert
+        # or delete, replaying the commands gives the same sets
+        super(BaseWriteExtensions, changed).write({fname: applied})
+        return True
+
+    @api.model
+    def write_many(self, vals_list, on_error='raise'):
+        """ Write a different ``vals`` on each record, given by ``vals['id']``.
+
+        :param on_error: ``'raise'`` to fail as a whole like ``write()``, or
+            ``'collect'`` to write every valid row and report the others
+        :return: ``(records, errors)``: the records written, and one dict per
+            failed row with ``index``, ``id``, ``vals``, ``type``, ``message``
+            and ``error``
+        """
+        def write(items):
+            # Rows with the same values are written in a single call
+            groups = {}
+            for index, vals in items:
+                key = repr(sorted((fname, value) for fname, value in vals.items() if fname != 'id'))
+                groups.setdefault(key, []).append((index, vals))
+            if len({vals['id'] for _index, vals in items}) < len(items):
+                # The same record is written twice: keep the order of the rows
+                groups = {index: [(index, vals)] for index, vals in items}
+            for group in groups.values():
+                records = self.browse([vals['id'] for _index, vals in group])
+                records.write({fname: value for fname, value in group[0][1].items() if fname != 'id'})
+            return [(index, self.browse(vals['id'])) for index, vals in items]
+
+        return self._run_collecting(list(enumerate(vals_list)), write, on_error)
+
+    @api.model
+    def create_many(self, vals_list, on_error='raise'):
+        """ Create records like ``create()``, see ``write_many()`` for
+        ``on_error`` and the returned value.
+        """
+        def create(items):
+            records = self.create([vals for _index, vals in items])
+            return [(index, record) for (index, _vals), record in zip(items, records)]
+
+        return self._run_collecting(list(enumerate(vals_list)), create, on_error)
+
+    @api.model
+    def _run_collecting(self, items, func, on_error):
+        if on_error not in ('raise', 'collect'):
+            raise ValueError("on_error must be 'raise' or 'collect', got %r" % on_error)
+        if on_error == 'raise' or not items:
+            results = func(items) if items else []
+            return self.browse([record.id for _index, record in results]), []
+        errors = []
+        results = sorted(self._run_isolated(items, func, errors), key=lambda result: result[0])
+        return self.browse([record.id for _index, record in results]), [
+            {
+                'index': index,
+                'id': vals.get('id'),
+                'vals': vals,
+                'type': type(error).__name__,
+                'message': str(error),
+                'error': error,
+            }
+            for (index, vals), error in sorted(errors, key=lambda error: error[0][0])
+        ]
+
+    @api.model
+    def _run_isolated(self, items, func, errors):
+        """ Run ``func(items)`` in a savepoint. When it fails, run each half in
+        its own savepoint, down to the single failing rows, which are
+        appended to ``errors``. Return what the successful calls returned.
+        """
+        try:
+            with self.env.cr.savepoint():
+                return func(items)
+        except COLLECTED_ERRORS as error:
+            # Whatever the failed call left in the cache was rolled back
+            self.env.transaction.clear()
+            if len(items) == 1:
+                errors.append((items[0], error))
+                return []
+        middle = len(items) // 2
+        return self._run_isolated(items[:middle], func, errors) + self._run_isolated(items[middle:], func, errors)
+
+    @api.model
+    def upsert(self, vals_list, conflict_fields, batch_size=1000):
+        """ Insert or update ``vals_list`` with ``INSERT ... ON CONFLICT``.
+
+        :param vals_list: list of dicts, like ``create()``
+        :param conflict_fields: fields of the unique index used to match rows
+        :return: recordset of the upserted records, in input order
+        """
+        if not vals_list:
+            return self.browse()
+        conflict_fields = list(conflict_fields)
+        self.check_access_rights('create')
+        self.check_access_rights('write')
+
+        for vals in vals_list:
+            for fname in vals:
+                field = self._fields.get(fname)
+                if field is None or not field.store or not field.column_type or callable(field.translate):
+                    raise ValueError("upsert() only supports stored column fields, got %s.%s" % (self._name, fname))
+            missing = [fname for fname in conflict_fields if fname not in vals]
+            if missing:
+                raise ValueError("upsert() needs a value for %s in every row" % ", ".join(missing))
+        if any(self._fields[fname].translate for fname in conflict_fields):
+            raise ValueError("upsert() cannot match rows on translated fields")
+        # Like create() and write(): fields restricted with groups= are refused
+        vals_fnames = list({fname for vals in vals_list for fname in vals})
+        self.check_field_access_rights('create', vals_fnames)
+        self.check_field_access_rights('write', vals_fnames)
+
+        # Rows sharing the same key must be merged: PostgreSQL refuses to
+        # update the same row twice in one statement
+        merged = {}
+        for vals in vals_list:
+            key = self._upsert_key(vals, conflict_fields)
+            if None in key:
+                raise ValueError("upsert() cannot match rows on empty values: %r" % (vals,))
+            merged[key] = {**merged.get(key, {}), **vals}
+
+        # Pending ORM writes must reach the table before we bypass the ORM
+        self.env.flush_all()
+
+        ids_by_key = {}
+        inserted_ids, updated_ids = [], []
+        written = set()
+        keys = list(merged)
+        for start in range(0, len(keys), batch_size):
+            pending = keys[start:start + batch_size]
+            while pending:
+                # Like write(), rows are checked against the record rules as
+                # they are BEFORE the update; they stay locked until the end
+                existing = self._upsert_lookup(pending, conflict_fields)
+                self.browse(existing.values()).check_access_rule('write')
+                # Group by field set, so each statement has a single column list
+                groups = {}
+                for key in pending:
+                    groups.setdefault(frozenset(merged[key]), []).append(key)
+                pending = []
+                for fnames, group_keys in groups.items():
+                    written.update(fnames)
+                    # Raw SQL bypasses _create()/_write(): maintain the rollups
+                    # (Search.py) the same way, before and after the statement
+                    old = self.browse([existing[key] for key in group_keys if key in existing])
+                    touched = old._rollups_touching(fnames) if self._rollups else []
+                    for name in touched:
+                        old._rollup_apply(name, -1)
+                    result = self._upsert_rows(
+                        fnames, [merged[key] for key in group_keys], conflict_fields, old.ids,
+                    )
+                    new = self.browse([result[key] for key in group_keys if key in result and key not in existing])
+                    for name in touched:
+                        old._rollup_apply(name, 1)
+                    for name in self._rollups:
+                        new._rollup_apply(name, 1)
+                    for key in group_keys:
+                        if key not in result:
+                            # Inserted by another transaction after the lookup:
+                            # it is checked, then updated, in the next round
+                            pending.append(key)
+                            continue
+                        ids_by_key[key] = result[key]
+                        (updated_ids if key in existing else inserted_ids).append(result[key])
+
+        inserted = self.browse(inserted_ids)
+        updated = self.browse(updated_ids)
+        (inserted | updated).invalidate_recordset()
+        # Same search cache invalidation (Search.py) as create() and write()
+        if inserted:
+            self._search_cache_invalidate()
+        if updated:
+            self._search_cache_invalidate(written)
+
+        # Same post-processing as create() and write()
+        if self._parent_store:
+            if inserted:
+                inserted._parent_store_create()
+            if self._parent_name in written:
+                # _parent_store_update() moves records under a single parent
+                parent_field = self._fields[self._parent_name]
+                moved = collections.defaultdict(list)
+                updated_set = set(updated_ids)
+                for key, vals in merged.items():
+                    if self._parent_name in vals and ids_by_key[key] in updated_set:
+                        moved[parent_field.convert_to_cache(vals[self._parent_name], self)].append(ids_by_key[key])
+                for ids in moved.values():
+                    self.browse(ids)._parent_store_update()
+        # Like create() and write(): stored computed fields given explicitly
+        # keep the given value, they are neither computed nor recomputed
+        given = collections.defaultdict(list)
+        for key, vals in merged.items():
+            given[frozenset(vals)].append(ids_by_key[key])
+        with contextlib.ExitStack() as stack:
+            for fnames, ids in given.items():
+                stack.enter_context(self.env.protecting([self._fields[fname] for fname in fnames], self.browse(ids)))
+            for field in self._fields.values():
+                if field.store and field.compute:
+                    self.env.add_to_compute(field, inserted - self.env.protected(field))
+            inserted.modified(list(self._fields), create=True)
+            updated.modified(written)
+        inserted._validate_fields(list(self._fields))
+        updated._validate_fields(written)
+        inserted.check_access_rule('create')
+
+        return self.browse([ids_by_key[self._upsert_key(vals, conflict_fields)] for vals in vals_list])
+
+    def _upsert_key(self, values, conflict_fields):
+        # Values given by the caller and values read from the table give the
+        # same key once converted to the cache format
+        return tuple(self._fields[fname].convert_to_cache(values[fname], self) for fname in conflict_fields)
+
+    def _upsert_lookup(self, keys, conflict_fields):
+        """ Return ``{key: id}`` for the existing rows matching ``keys``, and
+        lock them until the end of the transaction.
+        """
+        columns = SQL(", ").join(SQL.identifier(fname) for fname in conflict_fields)
+        self.env.cr.execute(SQL(
+            "SELECT id, %s FROM %s WHERE (%s) IN %s FOR UPDATE",
+            columns, SQL.identifier(self._table), columns, tuple(keys),
+        ))
+        return {
+            self._upsert_key(dict(zip(conflict_fields, row)), conflict_fields): record_id
+            for record_id, *row in self.env.cr.fetchall()
+        }
+
+    def _upsert_rows(self, fnames, rows, conflict_fields, existing_ids):
+        """ Run one ``INSERT ... ON CONFLICT DO UPDATE`` for ``rows``, which
+        all have the field names ``fnames``. Only the rows ``existing_ids``
+        may be updated; return ``{key: id}`` for the rows inserted or updated.
+        """
+        # Defaults only end up in inserted rows: the SET clause below lists
+        # the fields given by the caller, never the defaults
+        defaults = {
+            fname: value
+            for fname, value in self.default_get([
+                name for name, field in self._fields.items()
+                if name not in fnames and field.store and field.column_type and name != 'id'
+            ]).items()
+            if self._fields[fname].store and self._fields[fname].column_type
+        }
+        columns = sorted(fnames) + sorted(defaults)
+        update_columns = [fname for fname in sorted(fnames) if fname not in conflict_fields]
+        magic = []
+        if self._log_access:
+            now = self.env.cr.now()
+            magic = [('create_uid', self.env.uid), ('create_date', now),
+                     ('write_uid', self.env.uid), ('write_date', now)]
+            columns = [fname for fname in columns if fname not in dict(magic)]
+            update_columns = [fname for fname in update_columns if fname not in dict(magic)]
+            update_columns += ['write_uid', 'write_date']
+
+        lang = self.env.lang or 'en_US'
+
+        def convert(fname, value):
+            field = self._fields[fname]
+            if not field.translate:
+                return field.convert_to_column(value, self)
+            # Like create(): the value is the English one too
+            value = field.convert_to_cache(value, self)
+            return Json({'en_US': value, lang: value}) if value else None
+
+        updates = []
+        for name in update_columns:
+            field = self._fields[name]
+            if field.translate and lang != 'en_US':
+                # Like write(): set the current language, keep the others, and
+                # fill in English only when it has no value yet
+                updates.append("""
+                    "{0}" = CASE WHEN EXCLUDED."{0}" IS NULL THEN NULL ELSE
+                        jsonb_build_object('en_US', EXCLUDED."{0}"->'en_US')
+                        || COALESCE("{1}"."{0}", '{{}}'::jsonb) || (EXCLUDED."{0}" - 'en_US') END
+                """.format(name, self._table))
+            elif field.translate:
+                updates.append("""
+                    "{0}" = CASE WHEN EXCLUDED."{0}" IS NULL THEN NULL ELSE
+                        COALESCE("{1}"."{0}", '{{}}'::jsonb) || EXCLUDED."{0}" END
+                """.format(name, self._table))
+            else:
+                updates.append('"{0}" = EXCLUDED."{0}"'.format(name))
+
+        params = []
+        for vals in rows:
+            vals = {**defaults, **vals}
+            params.append(tuple(
+                [convert(fname, vals[fname]) for fname in columns]
+                + [value for _name, value in magic]
+            ))
+        column_names = columns + [name for name, _value in magic]
+        query = """
+            INSERT INTO "{table}" ({columns}) VALUES {values}
+            ON CONFLICT ({conflict}) DO UPDATE SET {updates}
+            WHERE "{table}"."id" = ANY(%s::int[])
+            RETURNING id, {conflict}
+        """.format(
+            table=self._table,
+            columns=", ".join('"%s"' % name for name in column_names),
+            values=", ".join(["%s"] * len(params)),
+            conflict=", ".join('"%s"' % name for name in conflict_fields),
+            updates=", ".join(updates) or '"id" = "{}"."id"'.format(self._table),
+        )
+        self.env.cr.execute(query, params + [list(existing_ids)])
+        # Rows conflicting with a row outside existing_ids are neither
+        # inserted nor updated, and not returned
+        return {
+            self._upsert_key(dict(zip(conflict_fields, row)), conflict_fields): record_id
+            for record_id, *row in self.env.cr.fetchall()
+        }
+
+
+class MailThreadBatchTracking(models.AbstractModel):
+    _inherit = 'mail.thread'
+
+    def write(self, values):
+        mode = self.env.context.get('tracking_batch')
+        if mode and not (self.env.context.get('tracking_disable') or self.env.context.get('mail_notrack')) \
+                and not set(self._track_get_fields()).isdisjoint(values):
+            self._track_batch_prepare(postcommit=(mode == 'postcommit'))
+        return super().write(values)
+
+    def _track_prepare(self, fields_iter):
+        # Only the records prepared by _track_batch_prepare() are left to the
+        # batch: other records written in the same call are tracked as usual
+        batched = self.env.cr.precommit.data.get('mail.tracking.batch', {}).get('models', {}).get(self._name)
+        records = self.browse([record_id for record_id in self._ids if record_id not in batched]) if batched else self
+        return super(MailThreadBatchTracking, records)._track_prepare(fields_iter)
+
+    def _track_batch_prepare(self, postcommit=False):
+        """ Save the current value of the tracked fields; the first value seen
+        in the transaction wins, like standard tracking. Records already
+        tracked the standard way in this transaction are left to it.
+        """
+        fnames = self._track_get_fields()
+        standard = self.env.cr.precommit.data.get('mail.tracking.%s' % self._name, {})
+        records = self.browse([record_id for record_id in self.ids if record_id not in standard])
+        if not fnames or not records:
+            return
+        data = self.env.cr.precommit.data.setdefault('mail.tracking.batch', {})
+        if not data:
+            self.env.cr.precommit.add(self._track_batch_finalize)
+        data['postcommit'] = data.get('postcommit', False) or postcommit
+        initial = data.setdefault('models', {}).setdefault(self._name, {})
+        # The records are prefetched together: one SELECT per 1000 records
+        for record in records:
+            old_values = initial.setdefault(record.id, {})
+            for fname in fnames:
+                if fname not in old_values:
+                    old_values[fname] = record[fname]
+
+    def _track_batch_finalize(self):
+        """ Compute the tracking of the prepared records, like
+        ``message_track()``, then store it now or queue it.
+        """
+        data = self.env.cr.precommit.data.pop('mail.tracking.batch', {})
+        entries = []
+        for model_name, initial in data.get('models', {}).items():
+            records = self.env[model_name].browse(initial).exists().sudo()
+            fnames = {fname for old_values in initial.values() for fname in old_values}
+            tracked_fields = records.fields_get(fnames, attributes=('string', 'type', 'selection', 'currency_field'))
+            # Only the log messages of the batched records: the others belong
+            # to the standard _track_finalize(), which runs after this
+            messages = self.env.cr.precommit.data.get('mail.tracking.message.%s' % model_name, {})
+            bodies = {record_id: messages.pop(record_id) for record_id in initial if record_id in messages}
+            for record in records:
+                changes, tracking_value_ids = record._mail_track(tracked_fields, initial[record.id])
+                if not changes:
+                    continue
+                subtype = record._track_subtype({fname: initial[record.id][fname] for fname in changes})
+                entries.append({
+                    'model': model_name,
+                    'res_id': record.id,
+                    'changes': sorted(changes),
+                    'subtype_id': subtype.id if subtype and subtype.exists() else False,
+                    'body': bodies.get(record.id) or '',
+                    'tracking_value_ids': tracking_value_ids,
+                })
+        if not entries:
+            return
+        if data.get('postcommit'):
+            # Committed with the write itself: delayed, never lost
+            self.env['mail.tracking.batch'].sudo().create({
+                'user_id': self.env.uid,
+                'entries': json.loads(json.dumps(entries, default=str)),
+            })._trigger()
+        else:
+            self._track_batch_store(entries)
+        # Like _track_finalize(): this runs after the last flush
+        self.env.flush_all()
+
+    @api.model
+    def _track_batch_store(self, entries):
+        """ Log the tracking ``entries`` computed by ``_track_batch_finalize()``. """
+        logs = []
+        for entry in entries:
+            record = self.env[entry['model']].browse(entry['res_id']).sudo()
+            if entry['subtype_id']:
+                # Tracked subtypes notify the followers: standard message_post()
+                record.message_post(
+                    body=entry['body'],
+                    subtype_id=entry['subtype_id'],
+                    tracking_value_ids=entry['tracking_value_ids'],
+                )
+            else:
+                logs.append(entry)
+        if logs:
+            # Same values as _message_log(), with one INSERT for all messages
+            # and one INSERT for all tracking values
+            note_id = self.env['ir.model.data']._xmlid_to_res_id('mail.mt_note')
+            author = self.env.user.partner_id
+            messages = self.env['mail.message'].sudo().create([{
+                'model': entry['model'],
+                'res_id': entry['res_id'],
+                'message_type': 'notification',
+                'subtype_id': note_id,
+                'is_internal': True,
+                'author_id': author.id,
+                'email_from': author.email_formatted,
+                'body': entry['body'],
+            } for entry in logs])
+            self.env['mail.tracking.value'].sudo().create([
+                dict(vals[2] if isinstance(vals, (list, tuple)) else vals, mail_message_id=message.id)
+                for message, entry in zip(messages, logs)
+                for vals in entry['tracking_value_ids']
+            ])
+        for entry in entries:
+            record = self.env[entry['model']].browse(entry['res_id']).sudo()
+            record._message_track_post_template(set(entry['changes']))
+
+
+class MailTrackingBatch(models.Model):
+    _name = 'mail.tracking.batch'
+    _description = 'Deferred Mail Tracking'
+    _order = 'id'
+
+    user_id = fields.Many2one('res.users', required=True, ondelete='cascade')
+    entries = fields.Json(required=True)
+    error = fields.Text()
+
+    def _trigger(self):
+        """ Ask the queue's cron to run as soon as possible. """
+        cron = self.env['ir.cron'].sudo().search([
+            ('model_id.model', '=', self._name), ('code', '=', 'model._run_queue()'),
+        ], limit=1)
+        if not cron:
+            cron = self.env['ir.cron'].sudo().create({
+                'name': 'Mail: deferred tracking',
+                'model_id': self.env['ir.model']._get_id(self._name),
+                'state': 'code',
+                'code': 'model._run_queue()',
+                'interval_number': 1,
+                'interval_type': 'hours',
+                'numbercall': -1,
+                # Not the writer: the queue holds the tracking of every user
+                'user_id': self.env.ref('base.user_root').id,
+            })
+        cron._trigger()
+
+    @api.model
+    def _run_queue(self):
+        """ Store the queued tracking, one committed batch at a time; batches
+        locked by another runner, or that failed, are skipped.
+        """
+        # The queue has no access rights: it is only read by this method
+        self = self.sudo()
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM mail_tracking_batch WHERE error IS NULL
+                ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED
+            """)
+            row = self.env.cr.fetchone()
+            if not row:
+                return
+            batch = self.browse(row[0])
+            try:
+                with self.env.cr.savepoint():
+                    self.env['mail.thread'].with_user(batch.user_id)._track_batch_store(batch.entries)
+            except Exception as error:
+                # Kept in the queue with its error, for inspection
+                _logger.exception("Deferred tracking %s failed", batch.id)
+                batch.error = str(error)
+            else:
+                batch.unlink()
+            self.env.cr.commit()
+
+
+# ============================================
+# PARALLEL BATCH PROCESSING
+# ============================================
+def _batch_process_call(records, func):
+    """ Call ``func`` on ``records``: a method name of the model, or the
+    ``module:function`` path of a function taking the records.
+    """
+    module, _, name = func.rpartition(':')
+    if name.startswith('_'):
+        raise ValueError("Batch processing cannot call the private %r" % func)
+    if not module:
+        return getattr(records, func)()
+    return getattr(importlib.import_module(module), name)(records)
+
+
+# Run first in a spawned worker: the addons path must be set up before the
+# worker can import _batch_process_worker from this addon
+_BATCH_PROCESS_BOOTSTRAP = """
+import odoo
+odoo.tools.config.options.update(options)
+odoo.modules.module.initialize_sys_path()
+"""
+
+
+def _batch_process_worker(dbname, uid, context, su, run_id):
+    """ Entry point of a worker process: claim and process chunks until none
+    is left. Return the number of chunks processed.
+    """
+    registry = Registry(dbname)
+    processed = 0
+    while True:
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context, su)
+            # The runs and chunks are bookkeeping, they have no access rights:
+            # only func runs as the caller
+            chunk = env['batch.process.chunk'].sudo()._claim(run_id)
+            if not chunk:
+                return processed
+            try:
+                with cr.savepoint():
+                    chunk._process(env)
+            except Exception as error:
+                # Rolled back to the savepoint only: the chunk stays locked
+                # by this worker until _fail() is committed
+                env.transaction.clear()
+                _logger.exception("Batch chunk %s failed", chunk.id)
+                chunk._fail(error)
+        processed += 1
+
+
+class BatchProcessRun(models.Model):
+    _name = 'batch.process.run'
+    _description = 'Batch Processing Run'
+
+    name = fields.Char(required=True)
+    # Same model, domain, func and chunk size: see _batch_process()
+    key = fields.Char(required=True, index=True)
+    model = fields.Char(required=True)
+    func = fields.Char(required=True)
+    chunk_ids = fields.One2many('batch.process.chunk', 'run_id')
+
+    _sql_constraints = [
+        ('name_uniq', 'unique(name)', 'A batch run name must be unique.'),
+    ]
+
+    def _progress(self):
+        self.ensure_one()
+        self.env.cr.execute("""
+            SELECT state, COUNT(*) FROM batch_process_chunk WHERE run_id = %s GROUP BY state
+        """, [self.id])
+        counts = dict(self.env.cr.fetchall())
+        return {
+            'run': self.id,
+            'total': sum(counts.values()),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+        }
+
+
+class BatchProcessChunk(models.Model):
+    _name = 'batch.process.chunk'
+    _description = 'Batch Processing Chunk'
+    _order = 'id'
+
+    run_id = fields.Many2one('batch.process.run', required=True, ondelete='cascade', index=True)
+    record_ids = fields.Json(required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], default='pending', required=True)
+    attempts = fields.Integer()
+    error = fields.Text()
+
+    @api.model
+    def _claim(self, run_id):
+        """ Lock the next pending chunk of the run; chunks locked by other
+        workers are skipped. The lock is held until the chunk is committed.
+        """
+        self.env.cr.execute("""
+            SELECT id FROM batch_process_chunk
+            WHERE run_id = %s AND state = 'pending'
+            ORDER BY id LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """, [run_id])
+        row = self.env.cr.fetchone()
+        return self.browse(row[0] if row else [])
+
+    def _process(self, env):
+        """ Call the run's func on the chunk's records, as the user of ``env``. """
+        run = self.run_id
+        records = env[run.model].browse(self.record_ids).exists()
+        _batch_process_call(records, run.func)
+        self.write({'state': 'done', 'attempts': self.attempts + 1, 'error': False})
+
+    def _fail(self, error):
+        self.write({'state': 'failed', 'attempts': self.attempts + 1, 'error': str(error)})
+
+
+class BaseBatchProcess(models.AbstractModel):
+    _inherit = 'base'
+
+    @api.model
+    def _batch_process(self, domain, func, chunk_size=1000, workers=1, name=None):
+        """ Call ``func`` on the records matching ``domain``, ``chunk_size``
+        records at a time, in ``workers`` processes, committing every chunk.
+
+        :param func: public method name of the model, or public module-level
+            function taking the chunk's recordset
+        :param name: name of the run to resume; by default the last unfinished
+            run of the same model, domain, func and chunk size is resumed,
+            and a new run is started when there is none
+        :return: progress of the run, see ``batch.process.run._progress()``
+        """
+        if not isinstance(func, str):
+            if '<' in func.__qualname__ or '.' in func.__qualname__:
+                raise ValueError("_batch_process() needs a method name or a module-level function, got %r" % func)
+            func = '%s:%s' % (func.__module__, func.__qualname__)
+        if func.rpartition(':')[2].startswith('_'):
+            raise ValueError("_batch_process() cannot call the private %r" % func)
+        key = hashlib.sha1(json.dumps([self._name, domain, func, chunk_size], default=str).encode()).hexdigest()
+
+        # The run is committed before the workers start, from its own cursor
+        registry = self.env.registry
+        with registry.cursor() as cr:
+            env = self.env(cr=cr, su=True)
+            if name:
+                run = env['batch.process.run'].search([('name', '=', name)])
+            else:
+                run = env['batch.process.run'].search([
+                    ('key', '=', key), ('chunk_ids.state', 'in', ('pending', 'failed')),
+                ], order='id DESC', limit=1)
+            if run:
+                # Resume: retry what failed, keep what is done
+                run.chunk_ids.filtered(lambda chunk: chunk.state == 'failed').write({'state': 'pending'})
+            else:
+                ids = self.env(cr=cr)[self._name].search(domain, order='id').ids
+                run = env['batch.process.run'].create({
+                    'name': name or '%s %s' % (func, datetime.now().isoformat()),
+                    'key': key,
+                    'model': self._name,
+                    'func': func,
+                    'chunk_ids': [
+                        (0, 0, {'record_ids': ids[start:start + chunk_size]})
+                        for start in range(0, len(ids), chunk_size)
+                    ],
+                })
+            run_id = run.id
+
+        args = (self.env.cr.dbname, self.env.uid, dict(self.env.context), self.env.su, run_id)
+        if workers <= 1:
+            _batch_process_worker(*args)
+        else:
+            # spawn, not fork: a forked child would share the parent's connections
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=exec,
+                initargs=(_BATCH_PROCESS_BOOTSTRAP, {'options': dict(odoo.tools.config.options)}),
+            ) as pool:
+                for future in [pool.submit(_batch_process_worker, *args) for _ in range(workers)]:
+                    future.result()
+
+        with registry.cursor() as cr:
+            return self.env(cr=cr, su=True)['batch.process.run'].browse(run_id)._progress()
+
+
+# ============================================
+# VECTORIZED COMPUTE
+# ============================================
+class LinesBatch:
+    """ Columns of the lines of a one2many, for all the records of a batch.
+    ``group[i]`` is the position, in the batch, of the parent of line ``i``.
+    """
+
+    def __init__(self, size, group, columns):
+        self.size = size
+        self.group = group
+        self.columns = columns
+
+    def __getitem__(self, fname):
+        return self.columns[fname]
+
+    def sum(self, values):
+        return numpy.bincount(self.group, weights=values, minlength=self.size)
+
+    def count(self):
+        return numpy.bincount(self.group, minlength=self.size)
+
+    def min(self, values, initial=0.0):
+        result = numpy.full(self.size, numpy.inf)
+        numpy.minimum.at(result, self.group, values)
+        return numpy.where(numpy.isinf(result), initial, result)
+
+    def max(self, values, initial=0.0):
+        result = numpy.full(self.size, -numpy.inf)
+        numpy.maximum.at(result, self.group, values)
+        return numpy.where(numpy.isinf(result), initial, result)
+
+
+class ComputeBatch:
+    """ Columns of the records of a batch, see ``vectorized()``. """
+
+    def __init__(self, records, columns, lines):
+        self.records = records
+        self.size = len(records)
+        self.columns = columns
+        self.lines = lines
+
+    def __getitem__(self, fname):
+        return self.columns[fname]
+
+
+def _to_array(field, values):
+    # Same defaults as the ORM: NULL reads as 0 / False
+    if field.type in ('float', 'monetary'):
+        return numpy.array([value or 0.0 for value in values], dtype=numpy.float64)
+    if field.type in ('integer', 'many2one'):
+        return numpy.array([value or 0 for value in values], dtype=numpy.int64)
+    if field.type == 'boolean':
+        return numpy.array([bool(value) for value in values], dtype=bool)
+    return numpy.array(values, dtype=object)
+
+
+def _lines_domain(records, field):
+    """ Return the domain of the one2many ``field`` as a list. """
+    domain = field.domain(records) if callable(field.domain) else field.domain
+    if isinstance(domain, str):
+        # A string domain is evaluated by the client on each record: it can
+        # only be applied to the whole batch if it needs no field value
+        try:
+            domain = safe_eval(domain, {'uid': records.env.uid, 'context': records.env.context})
+        except ValueError:
+            raise UserError(
+                "The domain of %s depends on the record, it cannot be used by a "
+                "vectorized compute: give it as a list." % field
+            )
+    return list(domain or [])
+
+
+def _load_batch_sql(records, columns, one2many):
+    """ Read the batch with one SELECT per table. """
+    cr = records.env.cr
+    records.flush_recordset(list(columns))
+    position = {record_id: index for index, record_id in enumerate(records.ids)}
+    values = {fname: [None] * len(records) for fname in columns}
+    if columns:
+        cr.execute('SELECT id, {} FROM "{}" WHERE id IN %s'.format(
+            ", ".join('"%s"' % fname for fname in columns), records._table,
+        ), [tuple(records.ids)])
+        for record_id, *row in cr.fetchall():
+            for fname, value in zip(columns, row):
+                values[fname][position[record_id]] = value
+    batch_columns = {fname: _to_array(records._fields[fname], values[fname]) for fname in columns}
+
+    lines = {}
+    for name, (o2m_name, fnames) in one2many.items():
+        field = records._fields[o2m_name]
+        comodel = records.env[field.comodel_name]
+        # _search() applies active_test and the domain of the field;
+        # execute_query() flushes the fields of the domain and the columns
+        domain = [(field.inverse_name, 'in', records.ids)] + _lines_domain(records, field)
+        query = comodel._search(domain, order='id')
+        rows = records.env.execute_query(query.select(*(
+            comodel._field_to_sql(comodel._table, fname, query) for fname in [field.inverse_name] + list(fnames)
+        )))
+        lines[name] = LinesBatch(
+            len(records),
+            numpy.array([position[row[0]] for row in rows], dtype=numpy.int64),
+            {fname: _to_array(comodel._fields[fname], [row[1 + index] for row in rows])
+             for index, fname in enumerate(fnames)},
+        )
+    return ComputeBatch(records, batch_columns, lines)
+
+
+def _load_batch_cache(records, columns, one2many):
+    """ Read the batch through the ORM, for new records (onchange). """
+    batch_columns = {
+        fname: _to_array(records._fields[fname], [
+            record[fname].id if records._fields[fname].type == 'many2one' else record[fname]
+            for record in records
+        ])
+        for fname in columns
+    }
+    lines = {}
+    for name, (o2m_name, fnames) in one2many.items():
+        group, line_values = [], {fname: [] for fname in fnames}
+        domain = _lines_domain(records, records._fields[o2m_name])
+        for index, record in enumerate(records):
+            for line in record[o2m_name].filtered_domain(domain):
+                group.append(index)
+                for fname in fnames:
+                    value = line[fname]
+                    line_values[fname].append(value.id if line._fields[fname].type == 'many2one' else value)
+        comodel = records[o2m_name]
+        lines[name] = LinesBatch(
+            len(records),
+            numpy.array(group, dtype=numpy.int64),
+            {fname: _to_array(comodel._fields[fname], line_values[fname]) for fname in fnames},
+        )
+    return ComputeBatch(records, batch_columns, lines)
+
+
+def vectorized(*columns, **one2many):
+    """ Decorate a compute method working on whole columns instead of records.
+
+    :param columns: fields of the model, passed as arrays: ``batch['price']``
+    :param one2many: ``name=(one2many field, [fields of the lines])``, passed
+        as ``batch.lines[name]``, see ``LinesBatch``
+    The method receives a ``ComputeBatch`` and returns ``{field: array}``.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def compute(self):
+            if numpy is None:
+                raise UserError("The vectorized compute of %s needs numpy." % method.__name__)
+            real = self.filtered(lambda record: isinstance(record.id, int))
+            for records, load in ((real, _load_batch_sql), (self - real, _load_batch_cache)):
+                if not records:
+                    continue
+                result = method(records, load(records, columns, one2many))
+                for fname, values in result.items():
+                    for record, value in zip(records, values.tolist()):
+                        record[fname] = value
+        return compute
+    return decorate
\ No newline at end of file
@@ -0,0 +1,3 @@
+from . import Metrics
+from . import Search
+from . import Write
@@ -0,0 +1,10 @@
+{
+    'name': 'ORM Guide',
+    'version': '17.0.1.0.0',
+    'summary': 'Search and write examples, with the ORM extensions they describe',
+    'depends': ['mail', 'product'],
+    'data': [
+        'security/ir.model.access.csv',
+    ],
+    'license': 'LGPL-3',
+}
@@ -0,0 +1,4 @@
+from . import test_rollups
+from . import test_search_cache
+from . import test_upsert
+from . import test_write_changes
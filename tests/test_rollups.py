@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+ROLLUP = 'test_write_examples_month'
+
+
+@tagged('post_install', '-at_install')
+class TestRollups(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        Examples = type(self.env['write.examples'])
+        patcher = patch.object(Examples, '_rollups', {ROLLUP: {
+            'groupby': ['date:month', 'state', 'active'],
+            'measures': ['price'],
+        }})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # The table is created in the test's transaction, rolled back after it
+        self.addCleanup(lambda: getattr(self.registry, '_rollup_tables_checked', set()).discard(ROLLUP))
+        self.examples = self.env['write.examples']
+        self.records = self.examples.create([
+            {'name': 'a', 'date': '2024-01-05', 'state': 'draft', 'price': 10.0},
+            {'name': 'b', 'date': '2024-01-20', 'state': 'draft', 'price': 5.0},
+            {'name': 'c', 'date': '2024-02-03', 'state': 'confirmed', 'price': 7.0},
+            {'name': 'd', 'date': '2024-02-10', 'price': 3.0},
+        ])
+
+    def test_maintained(self):
+        self.records[0].price = 20.0
+        self.records[1].state = 'confirmed'
+        self.records[2].active = False
+        self.records[3].unlink()
+        self.assertEqual(self.examples.rollup_check(), [])
+
+    def test_read_group(self):
+        # Not flushed yet: the rollup must see it anyway
+        self.records[0].price = 30.0
+        domain = [('date', '>=', '2024-01-01'), '!', ('state', '=', 'confirmed')]
+        groupby, aggregates = ['date:month', 'state'], ['price:sum', '__count']
+        result = self.examples._rollup_read_group(ROLLUP, domain, groupby, aggregates, (), 0, None, None)
+        self.assertIsNotNone(result)
+        with patch.object(type(self.examples), '_rollups', {}):
+            expected = self.examples._read_group(domain, groupby, aggregates)
+        # The empty state is a group of its own, like in core
+        self.assertCountEqual(result, expected)
+        self.assertEqual(len(result), 2)
@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, new_test_user, tagged
+from odoo.tools import config
+
+
+@tagged('post_install', '-at_install')
+class TestSearchCache(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch.dict(config.options, {'search_cache_size': 100})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.countries = self.env['res.country'].with_context(search_cache=True)
+
+    def test_hit(self):
+        domain = [('code', 'in', ['BE', 'FR'])]
+        countries = self.countries.search(domain)
+        with self.assertQueryCount(0):
+            self.assertEqual(self.countries.search(domain), countries)
+
+    def test_write_invalidates(self):
+        domain = [('code', '=', 'BE')]
+        belgium = self.countries.search(domain)
+        self.assertTrue(belgium)
+        belgium.code = 'QQ'
+        self.assertFalse(self.countries.search(domain))
+
+    def test_record_rules(self):
+        user = new_test_user(self.env, login='search_cache_user', groups='base.group_user')
+        countries = self.countries.with_user(user)
+        domain = [('code', 'in', ['BE', 'FR'])]
+        self.assertEqual(len(countries.search(domain)), 2)
+        self.env['ir.rule'].create({
+            'name': 'Belgium only',
+            'model_id': self.env['ir.model']._get_id('res.country'),
+            'domain_force': "[('code', '=', 'BE')]",
+        })
+        self.assertEqual(countries.search(domain).mapped('code'), ['BE'])
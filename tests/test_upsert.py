@@ -0,0 +1,31 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestUpsert(TransactionCase):
+
+    def test_insert_and_update(self):
+        belgium = self.env.ref('base.be')
+        countries = self.env['res.country'].upsert([
+            {'code': 'QQ', 'name': 'Qountry'},
+            {'code': 'BE', 'name': 'Belgium (updated)'},
+        ], conflict_fields=['code'])
+        # In input order: the new country, then the existing one
+        self.assertEqual(len(countries), 2)
+        self.assertEqual(countries[1], belgium)
+        self.assertEqual(countries[0].code, 'QQ')
+        self.assertEqual(countries[0].name, 'Qountry')
+        self.assertEqual(belgium.name, 'Belgium (updated)')
+
+    def test_same_key_twice(self):
+        countries = self.env['res.country'].upsert([
+            {'code': 'QQ', 'name': 'First'},
+            {'code': 'QQ', 'name': 'Second'},
+        ], conflict_fields=['code'])
+        self.assertEqual(len(countries), 2)
+        self.assertEqual(countries[0], countries[1])
+        self.assertEqual(countries[0].name, 'Second')
+
+    def test_missing_key(self):
+        with self.assertRaises(ValueError):
+            self.env['res.country'].upsert([{'name': 'Nowhere'}], conflict_fields=['code'])
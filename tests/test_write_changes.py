@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestWriteChanges(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partners = cls.env['res.partner'].create([
+            {'name': 'Partner %d' % index, 'active': index < 3} for index in range(5)
+        ])
+
+    def count_writes(self):
+        """ Wrap the top of the write() chain of res.partner: every override
+        (mail.thread tracking included) runs once per recorded call.
+        """
+        calls = []
+        Partner = type(self.env['res.partner'])
+        write = Partner.write
+
+        def counted(records, vals):
+            calls.append((records.ids, dict(vals)))
+            return write(records, vals)
+        return calls, patch.object(Partner, 'write', counted)
+
+    def test_write_once(self):
+        calls, patcher = self.count_writes()
+        with patcher:
+            report = self.partners.write_changes({'active': True})
+        self.assertEqual(calls, [(self.partners[3:].ids, {'active': True})])
+        self.assertEqual(report, {'written_records': 2, 'skipped_records': 3, 'skipped_fields': 3})
+        self.assertEqual(self.partners.mapped('active'), [True] * 5)
+
+    def test_write_once_per_group(self):
+        calls, patcher = self.count_writes()
+        with patcher:
+            report = self.partners.write_changes({'active': True, 'name': 'Partner 0'})
+        self.assertEqual(calls, [
+            (self.partners[1:3].ids, {'name': 'Partner 0'}),
+            (self.partners[3:].ids, {'active': True, 'name': 'Partner 0'}),
+        ])
+        self.assertEqual(report, {'written_records': 4, 'skipped_records': 1, 'skipped_fields': 4})
+
+    def test_nothing_to_write(self):
+        calls, patcher = self.count_writes()
+        with patcher:
+            report = self.partners[:3].write_changes({'active': True})
+        self.assertEqual(calls, [])
+        self.assertEqual(report, {'written_records': 0, 'skipped_records': 3, 'skipped_fields': 3})